@@ -0,0 +1,59 @@
+import sys
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of rendered command responses, invalidated by a data version number
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.__entries = OrderedDict()  # key -> [version, message], least recently used first
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__entries)
+
+    def get(self, key, version):
+        """
+        Look up a response
+        :param key: Hashable key (command, normalized arguments, channel class)
+        :param version: Current data version, older entries are discarded
+        :return: Cached message or None
+        """
+        with self.__lock:
+            entry = self.__entries.pop(key, None)
+            if entry is not None and entry[0] == version:
+                self.__entries[key] = entry  # most recently used
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, version, message):
+        with self.__lock:
+            self.__entries.pop(key, None)
+            self.__entries[key] = [version, message]
+            while len(self.__entries) > self.max_entries:
+                self.__entries.popitem(last=False)
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+    def hit_ratio(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups else 0.0
+
+    def memory(self):
+        """
+        :return: Approximate number of bytes held by the cached keys and messages
+        """
+        with self.__lock:
+            return sum([sys.getsizeof(key) + sum([sys.getsizeof(arg) for arg in key[1]]) + sys.getsizeof(entry[1])
+                        for key, entry in self.__entries.items()])
@@ -4,6 +4,9 @@ Created on 2015-07-05
 @author: Valtyr Farshield
 """
 
+import calendar
+import time
+
 
 class BbCommon:
 
@@ -27,3 +30,16 @@ class BbCommon:
             return True
         except ValueError:
             return False
+
+    @staticmethod
+    def epoch(date_str, date_format="%Y-%m-%d %H:%M:%S"):
+        # converts an UTC date string (ex. zkillboard killTime) to a unix timestamp, 0 if it can not be parsed
+        try:
+            return calendar.timegm(time.strptime(date_str, date_format))
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def date_str(timestamp, date_format="%Y-%m-%d %H:%M:%S"):
+        # converts a unix timestamp to an UTC date string
+        return time.strftime(date_format, time.gmtime(timestamp))
@@ -0,0 +1,76 @@
+import threading
+import traceback
+import Queue
+from collections import deque
+
+
+class ChannelExecutor:
+    """
+    Bounded worker pool which keeps tasks of the same channel in order and runs different channels in parallel
+    """
+
+    def __init__(self, nr_workers, channel_depth, total_depth):
+        self.channel_depth = channel_depth  # maximum number of waiting tasks per channel
+        self.total_depth = total_depth      # maximum number of waiting tasks overall
+        self.rejected = 0                   # number of tasks refused because of overload
+
+        self.__queues = {}                  # channel -> waiting tasks, present while the channel has work
+        self.__ready = Queue.Queue()        # channels waiting for a worker
+        self.__pending = 0                  # number of waiting tasks
+        self.__lock = threading.Lock()
+
+        for idx in range(nr_workers):
+            worker = threading.Thread(target=self.__worker, name="bb-worker-{}".format(idx))
+            worker.daemon = True
+            worker.start()
+
+    def depth(self):
+        """
+        :return: Number of tasks waiting to be executed
+        """
+        with self.__lock:
+            return self.__pending
+
+    def submit(self, channel, task):
+        """
+        Queue a task for execution after all previously submitted tasks of the same channel
+        :param channel: Slack channel ID
+        :param task: Function without arguments
+        :return: False if the task was refused because the queues are full
+        """
+        with self.__lock:
+            queue = self.__queues.get(channel)
+            if self.__pending >= self.total_depth or (queue is not None and len(queue) >= self.channel_depth):
+                self.rejected += 1
+                return False
+
+            schedule = queue is None
+            if schedule:
+                queue = deque()
+                self.__queues[channel] = queue
+            queue.append(task)
+            self.__pending += 1
+
+        # channels already owned by a worker (or waiting for one) are not scheduled twice
+        if schedule:
+            self.__ready.put(channel)
+        return True
+
+    def __worker(self):
+        while True:
+            channel = self.__ready.get()
+            with self.__lock:
+                task = self.__queues[channel].popleft()
+                self.__pending -= 1
+
+            try:
+                task()
+            except Exception:
+                traceback.print_exc()
+
+            # give the other channels a turn before running the next task of this channel
+            with self.__lock:
+                if self.__queues[channel]:
+                    self.__ready.put(channel)
+                else:
+                    del self.__queues[channel]
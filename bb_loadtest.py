@@ -0,0 +1,298 @@
+"""
+Load test harness: replays Slack message events through the command executor and BountyBot.process_cmd,
+the way bb_plugin serves them, and reports throughput, latency per command and memory growth as JSON.
+
+Examples:
+    python bb_loadtest.py --synthetic 5000 --rate 200 --concurrency 4 --output loadtest.json
+    python bb_loadtest.py --events recorded.jsonl --bounties bounties.db --rate 0
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+
+from bountyconfig import BountyConfig
+from bb_executor import ChannelExecutor
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+class LoadTest:
+    """
+    Replays message events through a BountyBot built on a temporary bounties.db
+    """
+
+    # synthetic stream: [weight, command template] - {jcode}, {jcodes} and {static} are filled in randomly
+    SYNTHETIC_MIX = [
+        [1, "!bb hello"],
+        [1, "!bb help"],
+        [2, "!bb list"],
+        [1, "!bb list generic"],
+        [1, "!bb list jcode"],
+        [1, "!bb list jcode+"],
+        [2, "!bb search C2; static HS"],
+        [2, "!bb search C5"],
+        [1, "!bb search C13"],
+        [3, "!bb info {jcodes}"],
+        [2, "!bb check {jcodes}"],
+        [2, "!bb static {static}"],
+        [1, "!bb generic 1"],
+        [1, "!bb stats"],
+        [1, "!bb stats {jcode}"],
+        [1, "!bb more"],
+    ]
+    STATICS = ["D382", "B274", "N944", "Z647", "E545", "H296", "V911", "U210", "X877", "O477"]
+    GENERICS = ["C2; static HS", "C5", "C4; static C3"]
+
+    def __init__(self, epicenter_db, bounties_db=None, quota=False):
+        self.quota = quota              # charge events to the command quotas before executing them
+        self.messages = 0               # number of messages posted by Bounty Bot
+        self.message_bytes = 0          # total length of the posted messages
+        self.__talk_lock = threading.Lock()
+        self.__tmp_dir = tempfile.mkdtemp(prefix="bb_loadtest_")
+
+        # no Zkillboard/EvE-Scout polling and no Tripwire writes while load testing
+        BountyConfig.REPORTS_ACTIVE = False
+        BountyConfig.TRIP_INFO["enabled"] = False
+
+        tmp_bounties = os.path.join(self.__tmp_dir, "bounties.db")
+        if bounties_db:
+            # the database runs in WAL mode: recent rows may still be in the -wal file only
+            # (the -shm index is rebuilt by SQLite when the copy is opened)
+            for suffix in ["", "-wal"]:
+                if os.path.exists(bounties_db + suffix):
+                    shutil.copy(bounties_db + suffix, tmp_bounties + suffix)
+
+        from bountybot import BountyBot
+        self.bot = BountyBot(self.talk, epicenter_db, tmp_bounties)
+        if not self.bot.bountydb.list_generic():
+            for description in LoadTest.GENERICS:
+                self.bot.bountydb.add_generic(description)
+
+    # Stub Slackbot output function
+    def talk(self, _, message, priority=None):
+        with self.__talk_lock:
+            self.messages += 1
+            self.message_bytes += len(message)
+
+    def close(self):
+        shutil.rmtree(self.__tmp_dir, ignore_errors=True)
+
+    def synthetic(self, nr_events, seed=None):
+        """
+        Generate a random stream of read-only commands from Bounty Bot channels
+        :param nr_events: Number of events
+        :param seed: Random seed, for repeatable streams
+        :return: List of message events
+        """
+        rnd = random.Random(seed)
+        jcodes = []
+        for whclass in range(1, 7):
+            jcodes += self.bot.bountydb.search_generic("C{}".format(whclass))[1]
+        channels = [self.bot.ch["bountybot-config"], self.bot.ch["wormhole-sales"], self.bot.ch["testing"]]
+        channels += ["D{:08d}".format(idx) for idx in range(8)]  # direct channels
+        users = ["U{:08d}".format(idx) for idx in range(32)]
+
+        weighted = [template for [weight, template] in LoadTest.SYNTHETIC_MIX for _ in range(weight)]
+        events = []
+        for _ in range(nr_events):
+            text = rnd.choice(weighted).format(
+                jcode=rnd.choice(jcodes),
+                jcodes=" ".join(rnd.sample(jcodes, rnd.randint(1, BountyConfig.MAX_PARAMETER))),
+                static=rnd.choice(LoadTest.STATICS)
+            )
+            events.append({"type": "message", "channel": rnd.choice(channels), "user": rnd.choice(users), "text": text})
+
+        return events
+
+    @staticmethod
+    def read_events(file_name):
+        """
+        Read recorded Slack events, one JSON object per line; events without text are skipped
+        :param file_name: Path of the recording
+        :return: List of message events
+        """
+        events = []
+        with open(file_name) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    event = json.loads(line)
+                    if "text" in event and "channel" in event:
+                        events.append(event)
+        return events
+
+    def run(self, events, rate, concurrency):
+        """
+        Replay events: admitted by the quotas on the calling thread, then executed by a ChannelExecutor
+        which keeps the commands of a channel in order, as in bb_plugin
+        :param events: List of message events
+        :param rate: Events per second offered to the bot (0 for as fast as possible: a full executor queue
+                     then delays the next event instead of refusing it)
+        :param concurrency: Number of executor workers
+        :return: Results dictionary
+        """
+        executor = ChannelExecutor(concurrency, BountyConfig.CHANNEL_QUEUE, BountyConfig.TOTAL_QUEUE)
+        samples = []  # [command name, queue wait, duration]
+        counts = {"running": 0, "errors": 0, "rejected": 0}
+        done = threading.Condition(threading.Lock())
+        memory = [LoadTest.rss_kb()]
+
+        start = time.time()
+        for idx, event in enumerate(events):
+            if rate > 0:
+                delay = start + float(idx) / rate - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            if idx % 1000 == 999:
+                memory.append(LoadTest.rss_kb())
+            if self.quota and not self.bot.admit_cmd(event):
+                continue
+
+            with done:
+                counts["running"] += 1
+            task = self.__task(event, time.time(), samples, counts, done)
+            while not executor.submit(event["channel"], task):
+                if rate > 0:
+                    # refused as in production ("Bounty Bot is busy")
+                    with done:
+                        counts["running"] -= 1
+                        counts["rejected"] += 1
+                    break
+                time.sleep(0.001)
+
+        with done:
+            while counts["running"] > 0:
+                done.wait()
+        duration = time.time() - start
+        memory.append(LoadTest.rss_kb())
+
+        by_command = {}
+        for [name, _, elapsed] in samples:
+            by_command.setdefault(name, []).append(elapsed)
+        all_samples = [elapsed for [_, _, elapsed] in samples]
+
+        results = {
+            "events": len(events),
+            "executed": len(all_samples),
+            "errors": counts["errors"],
+            "rejected": counts["rejected"],
+            "rate": rate,
+            "concurrency": concurrency,
+            "duration": round(duration, 3),
+            "throughput": round(len(all_samples) / duration, 1) if duration > 0 else 0,
+            "latency": dict(
+                [["all", LoadTest.summary(all_samples)]] +
+                [[name, LoadTest.summary(durations)] for name, durations in by_command.items()]
+            ),
+            "queue_wait": LoadTest.summary([wait for [_, wait, _] in samples]),
+            "memory": {
+                "start_kb": memory[0],
+                "end_kb": memory[-1],
+                "peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                "growth_kb": memory[-1] - memory[0],
+                "samples_kb": memory,
+                "cache_entries": len(self.bot.cache),
+                "cache_kb": round(self.bot.cache.memory() / 1024.0, 1),
+                "cursors": len(self.bot.pager)
+            },
+            "messages": {"count": self.messages, "bytes": self.message_bytes}
+        }
+        if self.quota:
+            results["quota"] = {
+                "admitted": self.bot.quota.admitted,
+                "shed": self.bot.quota.shed,
+                "shed_commands": self.bot.quota.shed_commands
+            }
+
+        return results
+
+    def __task(self, event, submitted, samples, counts, done):
+        # executor task of an event, recording its queue wait and duration
+        words = event["text"].split(None, 2)
+        name = words[1].lower() if len(words) > 1 else ""
+
+        def task():
+            begin = time.time()
+            failed = False
+            try:
+                self.bot.process_cmd(event)
+            except Exception:
+                failed = True
+            end = time.time()
+
+            with done:
+                samples.append([name, begin - submitted, end - begin])
+                counts["errors"] += 1 if failed else 0
+                counts["running"] -= 1
+                done.notify_all()
+        return task
+
+    @staticmethod
+    def summary(durations):
+        """
+        :param durations: Command durations [seconds]
+        :return: Count, mean, p50, p99 and max in milliseconds
+        """
+        if not durations:
+            return {"count": 0}
+
+        durations = sorted(durations)
+        count = len(durations)
+        return {
+            "count": count,
+            "mean_ms": round(sum(durations) * 1000 / count, 3),
+            "p50_ms": round(durations[min(count - 1, int(count * 0.50))] * 1000, 3),
+            "p99_ms": round(durations[min(count - 1, int(count * 0.99))] * 1000, 3),
+            "max_ms": round(durations[-1] * 1000, 3)
+        }
+
+    @staticmethod
+    def rss_kb():
+        # current resident memory (Linux), otherwise the peak resident memory
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * resource.getpagesize() // 1024
+        except (IOError, IndexError, ValueError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Slack message events through Bounty Bot")
+    parser.add_argument("--events", help="recorded Slack events, one JSON object per line")
+    parser.add_argument("--synthetic", type=int, default=2000, help="number of synthetic events (without --events)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed of the synthetic stream")
+    parser.add_argument("--rate", type=float, default=100, help="events per second, 0 for as fast as possible")
+    parser.add_argument("--concurrency", type=int, default=BountyConfig.WORKERS, help="executor workers")
+    parser.add_argument("--quota", action="store_true", help="apply the user/channel command quotas")
+    parser.add_argument("--epicenter", default=os.path.join(basedir, "epicenter.db"), help="epicenter database")
+    parser.add_argument("--bounties", help="bounties database to start from (copied, never modified)")
+    parser.add_argument("--output", help="results file (JSON), printed if omitted")
+    args = parser.parse_args()
+
+    load_test = LoadTest(args.epicenter, args.bounties, args.quota)
+    try:
+        if args.events:
+            events = LoadTest.read_events(args.events)
+        else:
+            events = load_test.synthetic(args.synthetic, args.seed)
+        results = load_test.run(events, args.rate, max(1, args.concurrency))
+    finally:
+        load_test.close()
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print "[Info] Results written to {}".format(args.output)
+    else:
+        print output
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,202 @@
+"""
+Randomized property and throughput harness of the wormhole mass calculator: runs random spawn/splash/shrink
+sequences over every static code of the Epicenter database, checks the invariants of WormholeCrit after each
+operation and reports the violations and the operations per second as JSON.
+
+Examples:
+    python bb_masstest.py --sequences 1000000 --seed 1 --output masstest.json
+    python bb_masstest.py --sequences 200000 --no-check
+"""
+
+import argparse
+import json
+import os
+import random
+import signal
+import time
+
+from epicenter import Epicenter
+from masscalc.wormholecrit import WormholeCrit
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+class OperationTimeout(Exception):
+    pass
+
+
+class MassTest:
+    """
+    Random operation sequences on WormholeCrit, with invariant checks
+    """
+
+    STATES = [WormholeCrit.NEW, WormholeCrit.STABLE, WormholeCrit.DESTAB, WormholeCrit.CRIT]
+
+    # operation mix: [weight, operation]
+    MIX = [[16, "splash"], [3, "shrink"], [1, "chance"]]
+
+    EPSILON = 1e-6   # tolerance of the mass comparisons
+    EXAMPLES = 10    # sequences kept for each violated invariant
+
+    def __init__(self, epicenter_db, max_ops=100, timeout=1.0):
+        """
+        :param epicenter_db: Epicenter database (static codes)
+        :param max_ops: Maximum operations of a sequence
+        :param timeout: Seconds an operation may run before it counts as an infinite loop
+        """
+        self.max_ops = max_ops
+        self.timeout = timeout
+        self.statics = [
+            static for static in Epicenter(epicenter_db, "wormholes", "statics").static_masses()
+            if static[1] > 0 and static[2] > 0
+        ]
+
+    def run(self, nr_sequences, seed=None, check=True):
+        """
+        :param nr_sequences: Number of random sequences
+        :param seed: Random seed, for repeatable runs
+        :param check: Verify the invariants (disable to measure the calculator alone)
+        :return: Results dictionary
+        """
+        rnd = random.Random(seed)
+        weighted = [operation for [weight, operation] in MassTest.MIX for _ in range(weight)]
+        violations = {}   # invariant -> [count, examples]
+        operations = {}   # operation -> [count, seconds]
+        collapsed = 0
+
+        previous_handler = signal.signal(signal.SIGALRM, MassTest.__timeout)
+        start = time.time()
+        try:
+            for _ in range(nr_sequences):
+                [code, maxmass, maxjump] = rnd.choice(self.statics)
+                state = rnd.choice(MassTest.STATES)
+                history = [["spawn", code, state]]
+                wh = WormholeCrit(maxmass, maxjump, state)
+
+                for _ in range(rnd.randint(1, self.max_ops)):
+                    operation = rnd.choice(weighted)
+                    ship_mass = round(rnd.uniform(0, maxjump * 1.2), 1)
+                    history.append([operation, ship_mass] if operation != "shrink" else [operation])
+
+                    before = [wh.wh_state, wh.mass]
+                    [failed, result] = self.__apply(wh, operation, ship_mass, operations)
+                    if failed:
+                        MassTest.__violation(violations, failed, history)
+                        break
+
+                    if check:
+                        for invariant in MassTest.__check(wh, before, operation, ship_mass, result):
+                            MassTest.__violation(violations, invariant, history)
+
+                    if wh.wh_state == WormholeCrit.COLLAPSED:
+                        collapsed += 1
+                        break
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        duration = time.time() - start
+
+        nr_operations = sum([count for [count, _] in operations.values()])
+        return {
+            "sequences": nr_sequences,
+            "seed": seed,
+            "checked": check,
+            "collapsed": collapsed,
+            "duration": round(duration, 3),
+            "operations": nr_operations,
+            "ops_per_second": round(nr_operations / duration, 1) if duration > 0 else 0,
+            "calculator": dict([
+                [operation, {
+                    "count": count,
+                    "ops_per_second": round(count / seconds, 1) if seconds > 0 else 0
+                }] for operation, [count, seconds] in operations.items()
+            ]),
+            "violations": dict([
+                [invariant, {"count": count, "examples": examples}]
+                for invariant, [count, examples] in violations.items()
+            ])
+        }
+
+    def __apply(self, wh, operation, ship_mass, operations):
+        # run one operation under the infinite loop guard: [failure or None, operation result]
+        signal.setitimer(signal.ITIMER_REAL, self.timeout)
+        start = time.time()
+        try:
+            if operation == "splash":
+                result = wh.splash(ship_mass)
+            elif operation == "shrink":
+                result = wh.shrink()
+            else:
+                result = wh.collapse_chance(ship_mass)
+        except OperationTimeout:
+            return ["infinite_loop", None]
+        except Exception as e:
+            return ["exception: {}".format(type(e).__name__), None]
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+        entry = operations.setdefault(operation, [0, 0.0])
+        entry[0] += 1
+        entry[1] += time.time() - start
+        return [None, result]
+
+    @staticmethod
+    def __check(wh, before, operation, ship_mass, result):
+        # names of the invariants broken by the last operation
+        broken = []
+        [lo, hi] = wh.mass
+        if lo > hi + MassTest.EPSILON:
+            broken.append("min_above_max")
+        if lo < -MassTest.EPSILON or hi < -MassTest.EPSILON:
+            broken.append("negative_mass")
+        if wh.wh_state > before[0]:
+            broken.append("state_increased")
+        if wh.wh_state != WormholeCrit.COLLAPSED and hi > before[1][1] + MassTest.EPSILON:
+            broken.append("max_increased")
+
+        if operation == "splash":
+            allowed = 0 < ship_mass <= wh.max_jump and before[0] != WormholeCrit.COLLAPSED
+            if result[0] != allowed:
+                broken.append("splash_maxjump")
+        elif operation == "chance":
+            if not 0 <= result[1] <= 100:
+                broken.append("chance_range")
+
+        return broken
+
+    @staticmethod
+    def __violation(violations, invariant, history):
+        entry = violations.setdefault(invariant, [0, []])
+        entry[0] += 1
+        if len(entry[1]) < MassTest.EXAMPLES:
+            entry[1].append(list(history))
+
+    @staticmethod
+    def __timeout(*_):
+        raise OperationTimeout()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Random property and throughput test of the mass calculator")
+    parser.add_argument("--sequences", type=int, default=100000, help="number of random sequences")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--max-ops", type=int, default=100, help="maximum operations of a sequence")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before an operation is an infinite loop")
+    parser.add_argument("--no-check", action="store_true", help="only measure the operations per second")
+    parser.add_argument("--epicenter", default=os.path.join(basedir, "epicenter.db"), help="epicenter database")
+    parser.add_argument("--output", help="results file (JSON), printed if omitted")
+    args = parser.parse_args()
+
+    mass_test = MassTest(args.epicenter, max(1, args.max_ops), args.timeout)
+    results = mass_test.run(args.sequences, args.seed, not args.no_check)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+        print "[Info] Results written to {}".format(args.output)
+    else:
+        print output
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,216 @@
+import BaseHTTPServer
+import threading
+from collections import OrderedDict
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed bucket bounds (seconds)
+    """
+
+    BOUNDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+    def __init__(self, bounds=None):
+        self.bounds = list(bounds) if bounds is not None else LatencyHistogram.BOUNDS
+        self.buckets = [0] * (len(self.bounds) + 1)  # last bucket holds everything above the highest bound
+        self.count = 0
+        self.sum = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, value):
+        idx = 0
+        while idx < len(self.bounds) and value > self.bounds[idx]:
+            idx += 1
+
+        with self.__lock:
+            self.buckets[idx] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimate a quantile from the buckets
+        :param q: Quantile between 0 and 1 (ex. 0.99)
+        :return: Upper bound of the bucket holding the quantile (None if nothing was observed)
+        """
+        with self.__lock:
+            if self.count == 0:
+                return None
+            rank = q * self.count
+            seen = 0
+            for idx, bucket in enumerate(self.buckets):
+                seen += bucket
+                if seen >= rank:
+                    return self.bounds[idx] if idx < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def mean(self):
+        with self.__lock:
+            return self.sum / self.count if self.count else 0.0
+
+
+class Counter:
+    """
+    Monotonically increasing value, either increased directly or read from a function when collected
+    """
+
+    def __init__(self, function=None):
+        self.function = function  # called without arguments on every collection, if given
+        self.value = 0
+        self.__lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.__lock:
+            self.value += amount
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class Gauge:
+    """
+    Value which can go up and down, either set directly or read from a function when collected
+    """
+
+    def __init__(self, function=None):
+        self.function = function  # called without arguments on every collection, if given
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.function() if self.function is not None else self.value
+
+
+class MetricsRegistry:
+    """
+    Named counters, gauges and histograms, optionally labelled, with Prometheus text exposition
+    """
+
+    def __init__(self):
+        self.__families = OrderedDict()  # name -> [type, help, OrderedDict of label tuple -> metric]
+        self.__lock = threading.Lock()
+
+    def counter(self, name, help_text, labels=None, function=None):
+        """
+        :param function: Read the counter from this function when collected (replaces the previous function)
+        """
+        counter = self.__metric(name, "counter", help_text, labels, Counter)
+        if function is not None:
+            counter.function = function
+        return counter
+
+    def gauge(self, name, help_text, labels=None, function=None):
+        """
+        :param function: Read the gauge from this function when collected (replaces the previous function)
+        """
+        gauge = self.__metric(name, "gauge", help_text, labels, Gauge)
+        if function is not None:
+            gauge.function = function
+        return gauge
+
+    def histogram(self, name, help_text, labels=None, bounds=None):
+        return self.__metric(name, "histogram", help_text, labels, lambda: LatencyHistogram(bounds))
+
+    def add(self, name, help_text, metric, labels=None):
+        """
+        Register an existing metric object (Counter, Gauge or LatencyHistogram)
+        :return: The metric
+        """
+        metric_type = {Counter: "counter", Gauge: "gauge", LatencyHistogram: "histogram"}[metric.__class__]
+        with self.__lock:
+            family = self.__family(name, metric_type, help_text)
+            family[2][MetricsRegistry.__label_key(labels)] = metric
+        return metric
+
+    def collect(self, prefix=""):
+        """
+        :param prefix: Only metrics whose name starts with this prefix
+        :return: List of [name, type, help, [[labels, metric], ...]]
+        """
+        with self.__lock:
+            return [[name, family[0], family[1], family[2].items()]
+                    for name, family in self.__families.items() if name.startswith(prefix)]
+
+    def exposition(self):
+        """
+        :return: All metrics in the Prometheus text exposition format
+        """
+        lines = []
+        for [name, metric_type, help_text, metrics] in self.collect():
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, metric_type))
+            for labels, metric in metrics:
+                if metric_type in ["counter", "gauge"]:
+                    lines.append("{}{} {}".format(name, MetricsRegistry.__labels(labels), metric.get()))
+                else:
+                    cumulative = 0
+                    for bound, bucket in zip(metric.bounds + ["+Inf"], list(metric.buckets)):
+                        cumulative += bucket
+                        lines.append("{}_bucket{} {}".format(
+                            name, MetricsRegistry.__labels(labels + (("le", str(bound)),)), cumulative
+                        ))
+                    lines.append("{}_sum{} {}".format(name, MetricsRegistry.__labels(labels), metric.sum))
+                    lines.append("{}_count{} {}".format(name, MetricsRegistry.__labels(labels), metric.count))
+
+        return "\n".join(lines) + "\n"
+
+    def __metric(self, name, metric_type, help_text, labels, factory):
+        key = MetricsRegistry.__label_key(labels)
+        with self.__lock:
+            family = self.__family(name, metric_type, help_text)
+            if key not in family[2]:
+                family[2][key] = factory()
+            return family[2][key]
+
+    def __family(self, name, metric_type, help_text):
+        family = self.__families.get(name)
+        if family is None:
+            family = [metric_type, help_text, OrderedDict()]
+            self.__families[name] = family
+        elif family[0] != metric_type:
+            raise ValueError("Metric '{}' is already registered as a {}".format(name, family[0]))
+        return family
+
+    @staticmethod
+    def __label_key(labels):
+        return tuple(sorted(labels.items())) if labels else ()
+
+    @staticmethod
+    def __labels(label_key):
+        if not label_key:
+            return ""
+        return "{" + ",".join(['{}="{}"'.format(key, str(value).replace('"', '\\"')) for key, value in label_key]) + "}"
+
+
+class MetricsServer:
+    """
+    Local HTTP endpoint serving the metrics of a registry in the Prometheus text format (GET /metrics)
+    """
+
+    def __init__(self, registry, port, host="127.0.0.1"):
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = registry.exposition()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *_):
+                pass  # no log line per scrape
+
+        self.server = BaseHTTPServer.HTTPServer((host, port), Handler)
+        server_thread = threading.Thread(target=self.server.serve_forever, name="bb-metrics")
+        server_thread.daemon = True
+        server_thread.start()
+
+
+# Metrics of the whole process
+metrics = MetricsRegistry()
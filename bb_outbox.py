@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import deque
+
+from bb_metrics import LatencyHistogram
+
+
+class Outbox:
+    """
+    Outbound Slack message scheduler: per-channel token bucket, priority classes and coalescing
+    """
+
+    PRIORITY_REPORT = 0   # kill and Thera reports
+    PRIORITY_REPLY = 1    # command replies
+    PRIORITY_CHATTER = 2  # announcements, echoes, greetings
+    PRIORITIES = [PRIORITY_REPORT, PRIORITY_REPLY, PRIORITY_CHATTER]
+
+    def __init__(self, rate, burst, window, max_length):
+        self.rate = rate              # messages per second allowed in a channel
+        self.burst = burst            # messages which can be sent at once after a quiet period
+        self.window = window          # seconds between queued messages which may be merged into one post
+        self.max_length = max_length  # maximum characters of a merged post
+
+        self.sent = 0                 # number of posts handed to Slack
+        self.coalesced = 0            # number of messages merged into another post
+        self.latency = LatencyHistogram([0.1, 0.5, 1, 2, 5, 10, 30, 60, 300])  # queue time of sent messages
+
+        self.__queues = {}            # channel -> [deque per priority] of [enqueue time, message]
+        self.__buckets = {}           # channel -> [tokens, last refill time]
+        self.__lock = threading.Lock()
+
+    def put(self, channel, message, priority=PRIORITY_REPLY):
+        """
+        Queue a message
+        :param channel: Slack channel ID
+        :param message: Message text
+        :param priority: One of Outbox.PRIORITIES
+        :return: None
+        """
+        with self.__lock:
+            if channel not in self.__queues:
+                self.__queues[channel] = [deque() for _ in Outbox.PRIORITIES]
+            self.__queues[channel][priority].append([time.time(), message])
+
+    def depth(self):
+        """
+        :return: Number of queued messages
+        """
+        with self.__lock:
+            return sum([len(queue) for queues in self.__queues.values() for queue in queues])
+
+    def flush(self, now=None):
+        """
+        Take every post which may be sent right now
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: List of [channel, message] pairs
+        """
+        now = time.time() if now is None else now
+        posts = []
+
+        with self.__lock:
+            for channel in self.__queues.keys():
+                queues = self.__queues[channel]
+
+                # refill the token bucket of the channel
+                [tokens, last_refill] = self.__buckets.get(channel, [self.burst, now])
+                tokens = min(self.burst, tokens + (now - last_refill) * self.rate)
+
+                while tokens >= 1:
+                    queue = next((queue for queue in queues if queue), None)
+                    if queue is None:
+                        break
+
+                    posts.append([channel, self.__coalesce(queue, now)])
+                    tokens -= 1
+
+                self.__buckets[channel] = [tokens, now]
+                if not any(queues):
+                    del self.__queues[channel]
+
+            # forget the buckets of quiet channels, they would be full again anyway
+            for channel in self.__buckets.keys():
+                [tokens, last_refill] = self.__buckets[channel]
+                if channel not in self.__queues and tokens + (now - last_refill) * self.rate >= self.burst:
+                    del self.__buckets[channel]
+
+            self.sent += len(posts)
+        return posts
+
+    def __coalesce(self, queue, now):
+        # merge the first message with the following ones queued within the window
+        [first_time, message] = queue.popleft()
+        self.latency.observe(now - first_time)
+
+        while queue and queue[0][0] - first_time <= self.window and \
+                len(message) + 1 + len(queue[0][1]) <= self.max_length:
+            [queue_time, next_message] = queue.popleft()
+            self.latency.observe(now - queue_time)
+            message += "\n" + next_message
+            self.coalesced += 1
+
+        return message
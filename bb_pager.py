@@ -0,0 +1,112 @@
+import threading
+import time
+
+
+class ResultSet:
+    """
+    Rows of a command result which may not fit in a single Slack message
+    """
+
+    def __init__(self, header, rows, separator=" ", fenced=True):
+        self.header = header        # text posted before the first page (ex. Matches: 25.)
+        self.rows = rows            # list of row strings
+        self.separator = separator  # text between two rows of the same page
+        self.fenced = fenced        # wrap the rows of every page in a code block
+
+    def pages(self, max_length, max_rows):
+        """
+        Lazily render the rows into pages
+        :param max_length: Maximum number of characters of a page
+        :param max_rows: Maximum number of rows of a page
+        :return: Generator of page messages
+        """
+        fence = "```" if self.fenced else ""
+        prefix = self.header + fence
+        page = []
+        length = len(prefix) + len(fence)
+
+        for row in self.rows:
+            extra = len(row) + (len(self.separator) if page else 0)
+            if page and (length + extra > max_length or len(page) >= max_rows):
+                yield prefix + self.separator.join(page) + fence
+                prefix = fence
+                page = []
+                length = len(prefix) + len(fence)
+                extra = len(row)
+
+            page.append(row)
+            length += extra
+
+        if page:
+            yield prefix + self.separator.join(page) + fence
+        elif not self.rows:
+            yield self.header
+
+
+class Pager:
+    """
+    Short-lived per-channel cursors over the remaining pages of a result
+    """
+
+    def __init__(self, ttl, max_cursors):
+        self.ttl = ttl                  # seconds a cursor is kept after its last page was taken
+        self.max_cursors = max_cursors  # maximum number of channels with an open cursor
+        self.__cursors = {}             # channel -> [next page, page generator, expiry]
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__cursors)
+
+    def start(self, channel, pages, now=None):
+        """
+        Open a cursor, replacing the previous one of the channel
+        :param channel: Slack channel ID
+        :param pages: Iterator of page messages
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: First page, followed by a hint if more pages are available
+        """
+        now = time.time() if now is None else now
+        first = next(pages, "")
+
+        with self.__lock:
+            self.__expire(now)
+            self.__cursors.pop(channel, None)
+        return self.__page(channel, first, pages, now)
+
+    def more(self, channel, now=None):
+        """
+        Take the next page of the channel's cursor
+        :param channel: Slack channel ID
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: Next page (followed by a hint if more pages are available) or None if there is no open cursor
+        """
+        now = time.time() if now is None else now
+
+        with self.__lock:
+            self.__expire(now)
+            cursor = self.__cursors.pop(channel, None)
+        if cursor is None:
+            return None
+
+        [page, pages, _] = cursor
+        return self.__page(channel, page, pages, now)
+
+    def __page(self, channel, page, pages, now):
+        # look one page ahead, so the hint is only shown if there really is more
+        next_page = next(pages, None)
+        if next_page is None:
+            return page
+
+        with self.__lock:
+            if len(self.__cursors) >= self.max_cursors:
+                oldest = min(self.__cursors.keys(), key=lambda key: self.__cursors[key][2])
+                del self.__cursors[oldest]
+            self.__cursors[channel] = [next_page, pages, now + self.ttl]
+
+        return page + "\n_More results available, type '!bb more' within {} minute(s)_".format(
+            max(1, int(self.ttl) // 60)
+        )
+
+    def __expire(self, now):
+        for channel in [channel for channel, cursor in self.__cursors.items() if cursor[2] <= now]:
+            del self.__cursors[channel]
@@ -4,18 +4,98 @@ Created on 2015-06-06
 @author: Valtyr Farshield
 """
 
-from bountybot import BountyBot
+import os
+import socket
 
-crontable = []
+from bountybot import BountyBot, basedir
+from bountydb import Zkb
+from bountyconfig import BountyConfig
+from epicenter import Epicenter
+from bb_executor import ChannelExecutor
+from bb_outbox import Outbox
+from bb_poller import KillPoller
+from bb_metrics import metrics, MetricsServer
+
+crontable = [[1, "flush_outputs"], [BountyConfig.MASS_TRACKER_TICK, "expire_wormholes"]]
 outputs = []
 
+# Outbound messages are rate limited per channel and merged when possible
+outbox = Outbox(
+    BountyConfig.OUTBOX_RATE,
+    BountyConfig.OUTBOX_BURST,
+    BountyConfig.OUTBOX_WINDOW,
+    BountyConfig.OUTBOX_MAX_LENGTH
+)
+
 
 # Sends a message to a specified Slack channel
-def talk(channel, message):
-    outputs.append([channel, message])
+def talk(channel, message, priority=Outbox.PRIORITY_REPLY):
+    outbox.put(channel, message, priority)
+
+
+# Job - hands the messages which may be posted now over to rtmbot
+def flush_outputs():
+    outputs.extend(outbox.flush())
+
+
+# Job - removes the tracked wormholes whose lifetime is over
+def expire_wormholes():
+    for handler in tenants:
+        if handler.whmanager:
+            handler.whmanager.expire()
+
+# Catalog and Zkillboard/Thera poller shared by all tenants
+epicenter = Epicenter(os.path.join(basedir, "epicenter.db"), "wormholes", "statics")
+poller = KillPoller(BountyConfig.INTERVAL, BountyConfig.WAIT, BountyConfig.CYCLE, Zkb.lastkill)
 
 # Bounty Bot handler
-bb = BountyBot(talk)
+bb = BountyBot(talk, epicenter=epicenter, poller=poller)
+tenants = [bb]
+
+# Bounty Bot handlers of the additional tenants, found by Slack team or by channel
+tenant_teams = {}
+tenant_channels = {}
+for tenant in BountyConfig.TENANTS:
+    print "[Info] Loading tenant '{}'".format(tenant["name"])
+    tenant_bb = BountyBot(
+        talk,
+        bounties_db=os.path.join(basedir, tenant["db"]),
+        channels=tenant["channels"],
+        epicenter=epicenter,
+        poller=poller,
+        tenant=tenant["name"]
+    )
+    tenants.append(tenant_bb)
+    if tenant.get("team"):
+        tenant_teams[tenant["team"]] = tenant_bb
+    for channel in tenant["channels"].values():
+        tenant_channels[channel] = tenant_bb
+
+# begin checking for kills once every tenant watches its systems
+if BountyConfig.REPORTS_ACTIVE:
+    poller.start()
+
+# Commands are executed off the event thread, in order within each channel
+executor = ChannelExecutor(BountyConfig.WORKERS, BountyConfig.CHANNEL_QUEUE, BountyConfig.TOTAL_QUEUE)
+
+# Queue depths and outbound message statistics, also served to a local scraper
+metrics.gauge("bb_executor_queue_depth", "Commands waiting for a worker", function=executor.depth)
+metrics.counter("bb_executor_rejected_total", "Commands refused because of full queues",
+                function=lambda: executor.rejected)
+metrics.gauge("bb_outbox_queue_depth", "Messages waiting to be posted", function=outbox.depth)
+metrics.counter("bb_outbox_sent_total", "Posts handed to Slack", function=lambda: outbox.sent)
+metrics.counter("bb_outbox_coalesced_total", "Messages merged into another post", function=lambda: outbox.coalesced)
+metrics.add("bb_outbox_queue_seconds", "Time messages waited in the outbox [seconds]", outbox.latency)
+if BountyConfig.METRICS_PORT:
+    try:
+        metrics_server = MetricsServer(metrics, BountyConfig.METRICS_PORT, BountyConfig.METRICS_HOST)
+        print "[Info] Metrics served at http://{}:{}/metrics".format(
+            BountyConfig.METRICS_HOST, BountyConfig.METRICS_PORT
+        )
+    except socket.error as e:
+        print "[Error] Metrics endpoint disabled, unable to listen on {}:{} - {}".format(
+            BountyConfig.METRICS_HOST, BountyConfig.METRICS_PORT, e
+        )
 
 
 # Event - connected to server
@@ -23,7 +103,20 @@ def process_hello(_):
     print "[Info] Bounty Bot connected to server"
 
 
+# Bounty Bot handler serving a message (direct messages and unknown channels go to the main one)
+def tenant_for(data):
+    if data.get("team") in tenant_teams:
+        return tenant_teams[data["team"]]
+    return tenant_channels.get(data["channel"], bb)
+
+
 # Event - message received
 def process_message(data):
     # print data["channel"], data["text"]
-    bb.process_cmd(data)
+    if "text" not in data:
+        return
+
+    handler = tenant_for(data)
+    if handler.router.addressed(data["text"]) and handler.admit_cmd(data):
+        if not executor.submit(data["channel"], lambda: handler.process_cmd(data)):
+            talk(data["channel"], "Bounty Bot is busy right now, please try again in a moment")
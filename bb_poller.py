@@ -0,0 +1,117 @@
+import threading
+import time
+
+from bountyconfig import BountyConfig
+from evescout.evescout import EveScout
+from bb_metrics import metrics
+
+
+class KillPoller:
+    """
+    Periodic Zkillboard and Thera poller shared by every bounty database of the process.
+    Each watched system is requested once per cycle, no matter how many bounty databases watch it.
+    """
+
+    def __init__(self, interval, apiwait, cyclelimit, lastkill):
+        self.__interval = interval      # period (seconds) of the __check() function
+        self.__apiwait = apiwait        # wait time between Zkillboard api calls
+        self.__cyclelimit = cyclelimit  # limit cycle ugly hack ;)
+        self.__cycle = 0                # cycle counter init to 0
+        self.__lastkill = lastkill      # function (solarSystemID, limit) -> [killID, killTime] or None
+
+        self.__subscribers = []         # bounty databases, see BountyDb.polled_systems/poll_thera/poll_kill
+        self.__started = False
+        self.__lock = threading.Lock()
+        self.requests = 0               # number of Zkillboard requests made
+
+        self.__cycles = metrics.counter("bb_poller_cycles_total", "Completed kill check cycles")
+        self.__cycle_duration = metrics.histogram(
+            "bb_poller_cycle_seconds", "Duration of a kill check cycle [seconds]",
+            bounds=[1, 5, 10, 30, 60, 120, 300, 600, 1200, 3600]
+        )
+        self.__watched = metrics.gauge("bb_poller_watched_systems", "Unique systems checked in the last cycle")
+        self.__thera_requests = metrics.counter(
+            "bb_upstream_requests_total", "Upstream API requests", {"upstream": "evescout"}
+        )
+        self.__thera_errors = metrics.counter(
+            "bb_upstream_errors_total", "Failed upstream API requests", {"upstream": "evescout"}
+        )
+        self.__thera_latency = metrics.histogram(
+            "bb_upstream_request_seconds", "Upstream API request time [seconds]", {"upstream": "evescout"}
+        )
+
+    def register(self, subscriber):
+        with self.__lock:
+            self.__subscribers.append(subscriber)
+
+    # start polling, only the first call has an effect
+    def start(self):
+        with self.__lock:
+            if self.__started:
+                return
+            self.__started = True
+
+        poller_thread = threading.Timer(1, self.__check, ())
+        poller_thread.setDaemon(True)
+        poller_thread.start()
+
+    # check every system watched by at least one subscriber
+    def __check(self):
+        print "[{}] Checking cycle {}...".format(time.strftime("%Y-%m-%d %H:%M:%S"), str(self.__cycle + 1))
+        threading.Timer(self.__interval, self.__check, ()).start()
+        check_counter = 0
+        cycle_start = time.time()
+
+        with self.__lock:
+            subscribers = list(self.__subscribers)
+
+        # populate list with wormhole connections from Thera (if enabled)
+        if BountyConfig.THERA:
+            start = time.time()
+            thera_systems = EveScout.thera_connections()
+            self.__thera_requests.inc()
+            self.__thera_latency.observe(time.time() - start)
+            if thera_systems is None:
+                self.__thera_errors.inc()
+                thera_systems = []
+            print "Retrieving Thera connections: {}".format(thera_systems)
+        else:
+            thera_systems = []
+
+        for subscriber in subscribers:
+            subscriber.poll_thera(thera_systems)
+
+        # union of the watched systems, in order of first appearance
+        system_ids = []
+        seen = set()
+        for subscriber in subscribers:
+            for sysId in subscriber.polled_systems():
+                if sysId not in seen:
+                    seen.add(sysId)
+                    system_ids.append(sysId)
+        self.__watched.set(len(system_ids))
+
+        for sysId in system_ids:
+            # fetch Zkillboard data and check if anything was received
+            time.sleep(self.__apiwait)
+            zkbInfo = self.__lastkill(sysId, self.__cycle + 1)
+            self.requests += 1
+
+            if zkbInfo != None:
+                check_counter += 1
+                for subscriber in subscribers:
+                    subscriber.poll_kill(sysId, zkbInfo)
+            else:
+                print "[Error] Zkillboard API call failed"
+
+        print "[Info] Cycle ended - {} wormholes were checked for {} bounty list(s)".format(
+            check_counter, len(subscribers)
+        )
+
+        self.__cycles.inc()
+        self.__cycle_duration.observe(time.time() - cycle_start)
+
+        # super ugly hack for limit cycling (to bypass mean zkb caching) >:)
+        self.__cycle += 1
+        if self.__cycle >= self.__cyclelimit:
+            self.__cycle = 0
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import deque
+
+
+class QuotaLimiter:
+    """
+    Sliding-window command quotas per user and per channel, with a cost weight per command
+    """
+
+    SHED_USER = "user"
+    SHED_CHANNEL = "channel"
+
+    def __init__(self, window, user_budget, channel_budget, costs, default_cost=1):
+        self.window = window                  # seconds covered by the sliding window
+        self.user_budget = user_budget        # cost a single user may spend within the window
+        self.channel_budget = channel_budget  # cost all users of a channel may spend within the window
+        self.costs = costs                    # command name -> cost weight
+        self.default_cost = default_cost      # cost of commands without a weight
+
+        self.admitted = 0                     # number of admitted commands
+        self.shed = {QuotaLimiter.SHED_USER: 0, QuotaLimiter.SHED_CHANNEL: 0}  # refusals by reason
+        self.shed_commands = {}               # command name -> number of refusals
+
+        self.__windows = {}                   # key -> [deque of [time, cost], cost sum, warned]
+        self.__last_sweep = 0
+        self.__lock = threading.Lock()
+
+    def cost(self, name):
+        return self.costs.get(name, self.default_cost)
+
+    def admit(self, user, channel, name, now=None):
+        """
+        Charge a command to the quotas of its user and channel
+        :param user: Slack user ID (None if unknown, only the channel quota applies then)
+        :param channel: Slack channel ID
+        :param name: Lower case name of a registered command (or CommandRouter.UNKNOWN)
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: [reason, warn] - reason is None if the command is admitted, otherwise SHED_USER or SHED_CHANNEL;
+        warn is True only for the first refusal of a user/channel until its usage drops below the quota again
+        """
+        now = time.time() if now is None else now
+        cost = self.cost(name)
+        checks = [[("c", channel), self.channel_budget, QuotaLimiter.SHED_CHANNEL]]
+        if user is not None:
+            checks.insert(0, [("u", user), self.user_budget, QuotaLimiter.SHED_USER])
+
+        with self.__lock:
+            if now - self.__last_sweep >= self.window:
+                self.__sweep(now)
+
+            entries = [self.__window(key, now) for [key, _, _] in checks]
+            for entry, [_, budget, reason] in zip(entries, checks):
+                if entry[1] + cost > budget:
+                    self.shed[reason] += 1
+                    self.shed_commands[name] = self.shed_commands.get(name, 0) + 1
+                    warn = not entry[2]
+                    entry[2] = True
+                    return [reason, warn]
+
+            for entry in entries:
+                entry[0].append([now, cost])
+                entry[1] += cost
+                entry[2] = False
+            self.admitted += 1
+            return [None, False]
+
+    def shed_total(self):
+        return sum(self.shed.values())
+
+    def __window(self, key, now):
+        # sliding window of a key, without the charges older than the window
+        entry = self.__windows.get(key)
+        if entry is None:
+            entry = [deque(), 0, False]
+            self.__windows[key] = entry
+
+        charges = entry[0]
+        while charges and charges[0][0] <= now - self.window:
+            entry[1] -= charges.popleft()[1]
+        return entry
+
+    def __sweep(self, now):
+        # forget the keys which did not execute anything within the window
+        for key in self.__windows.keys():
+            if not self.__window(key, now)[0]:
+                del self.__windows[key]
+        self.__last_sweep = now
@@ -0,0 +1,143 @@
+import time
+
+from bb_metrics import metrics
+
+
+class CommandRouter:
+    """
+    Dispatches Slack messages to command callbacks
+    """
+
+    UNKNOWN = "unknown"  # quota name of the messages which do not name a registered command
+
+    def __init__(self, cmd_start, talk, quota=None):
+        self.cmd_start = cmd_start             # accepted command prefixes (ex. !bb)
+        self.talk = talk                       # Slackbot output function
+        self.quota = quota                     # QuotaLimiter, or None for unlimited commands
+        self.__first_chars = set([prefix[0] for prefix in cmd_start])
+        self.__commands = {}                   # name -> [channel prefixes, callback, multiline]
+        self.calls = {}                        # name -> Counter of calls
+        self.latency = {}                      # name -> LatencyHistogram
+        self.failures = metrics.counter("bb_command_failures_total", "Commands which raised an exception")
+
+    def add(self, name, channels, callback, multiline=False):
+        """
+        Register a command
+        :param name: Command name (ex. help)
+        :param channels: Channel IDs or channel ID prefixes (ex. D) allowed to execute the command
+        :param callback: Function called with (channel, arguments)
+        :param multiline: Arguments are passed line by line instead of word by word
+        :return: None
+        """
+        self.__commands[name] = [tuple(channels), callback, multiline]
+        self.calls[name] = metrics.counter("bb_commands_total", "Executed commands", {"command": name})
+        self.latency[name] = metrics.histogram(
+            "bb_command_seconds", "Command execution time [seconds]", {"command": name}
+        )
+
+    def allowed(self, name, channel):
+        return name in self.__commands and channel.startswith(self.__commands[name][0])
+
+    def route(self, channel, text):
+        """
+        Execute the command contained in a message, if the message is addressed to Bounty Bot
+        :param channel: Slack channel ID
+        :param text: Message text
+        :return: True if the message was addressed to Bounty Bot
+        """
+        if not self.addressed(text):
+            return False
+
+        processed_data = text.encode('ascii', 'ignore').decode('ascii')
+        cmd_args = processed_data.split()
+
+        # Is it a valid command - at least one argument and command should be in list?
+        if len(cmd_args) > 1:
+            name = cmd_args[1].lower()
+            command = self.__commands.get(name)
+
+            if command is None:
+                # command not in list
+                self.talk(
+                    channel,
+                    "No such command '{}'. Type '!bb help' from a Bounty Bot channel for more info".format(
+                        cmd_args[1]
+                    )
+                )
+            elif not channel.startswith(command[0]):
+                # Make sure the command is executed from the correct channel
+                self.talk(channel, "Command '{}' can not be executed from this channel".format(cmd_args[1]))
+            else:
+                [_, callback, multiline] = command
+                start = time.time()
+                try:
+                    if multiline:
+                        callback(channel, CommandRouter.split_lines(processed_data))
+                    else:
+                        callback(channel, cmd_args[2:])  # ignore the first 2 arguments
+                except Exception:
+                    self.failures.inc()
+                    raise
+                finally:
+                    self.calls[name].inc()
+                    self.latency[name].observe(time.time() - start)
+
+        else:
+            # no argument specified
+            self.talk(
+                channel,
+                "Please specify at least one argument. Type '!bb help' from a Bounty Bot channel for more info"
+            )
+
+        return True
+
+    def admit(self, channel, user, text):
+        """
+        Charge a message addressed to Bounty Bot to the quotas, before it is parsed or queued
+        :param channel: Slack channel ID
+        :param user: Slack user ID (None if unknown)
+        :param text: Message text
+        :return: False if the message has to be dropped
+        """
+        if self.quota is None:
+            return True
+
+        # user text is never a quota key: the refusals by name are shown by '!bb quota'
+        words = text.split(None, 2)
+        name = words[1].lower() if len(words) > 1 else ""
+        if name not in self.__commands:
+            name = CommandRouter.UNKNOWN
+        [reason, warn] = self.quota.admit(user, channel, name)
+        if reason is None:
+            return True
+
+        # tell only once, otherwise the replies would be the spam
+        if warn:
+            if reason == self.quota.SHED_USER:
+                self.talk(channel, "<@{}> you are sending too many commands, please slow down".format(user))
+            else:
+                self.talk(channel, "Too many commands in this channel, please slow down")
+        return False
+
+    def addressed(self, text):
+        """
+        Cheap check whether a message is addressed to Bounty Bot, without parsing it
+        :param text: Message text
+        :return: True if the message starts with one of the command prefixes
+        """
+        text = text.lstrip()
+        if not text or text[0] not in self.__first_chars:
+            return False
+
+        return text.split(None, 1)[0].lower() in self.cmd_start
+
+    @staticmethod
+    def split_lines(text):
+        """
+        Split a multi-line command into the rest of the first line and the other non-empty lines
+        :param text: Message text, starting with the command prefix and name
+        :return: List of lines
+        """
+        lines = text.splitlines()
+        first_line = " ".join(lines[0].split()[2:]) if lines else ""
+        return [line.strip() for line in [first_line] + lines[1:] if line.strip()]
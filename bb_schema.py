@@ -0,0 +1,126 @@
+import sqlite3 as lite
+
+
+class BountySchema:
+    """
+    Versioned schema of the bounties database, tracked through PRAGMA user_version
+    """
+
+    MMAP_SIZE = 64 * 1024 * 1024  # bytes of the database file mapped in memory
+
+    def __init__(self, table_jcodes, table_generics, table_stats, table_thera, table_masstracker):
+        self.table_jcodes = table_jcodes
+        self.table_generics = table_generics
+        self.table_stats = table_stats
+        self.table_thera = table_thera
+        self.table_masstracker = table_masstracker
+
+        # migrations[i] upgrades the database from version i to version i + 1
+        self.migrations = [
+            self._v1_initial,
+            self._v2_typed_jcodes,
+            self._v3_thera_reports,
+            self._v4_mass_tracker,
+        ]
+
+    @staticmethod
+    def connect(db_name, shared=False):
+        """
+        Open a connection to the bounties database with the performance settings applied
+        :param db_name: SQLite database file name
+        :param shared: Connection will be used from several threads (callers must serialize its use)
+        :return: sqlite3 connection
+        """
+        conn = lite.connect(db_name, check_same_thread=not shared)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA mmap_size={}".format(BountySchema.MMAP_SIZE))
+        return conn
+
+    def migrate(self, conn):
+        """
+        Apply every migration the database has not seen yet, each one in its own transaction
+        :param conn: sqlite3 connection
+        :return: Schema version after migrating
+        """
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+        # manage transactions explicitly, sqlite3 would otherwise commit before every DDL statement
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None
+        try:
+            for new_version in range(version + 1, len(self.migrations) + 1):
+                cursor = conn.cursor()
+                cursor.execute("BEGIN")
+                try:
+                    self.migrations[new_version - 1](cursor)
+                    cursor.execute("PRAGMA user_version={}".format(new_version))
+                    cursor.execute("COMMIT")
+                except lite.Error:
+                    cursor.execute("ROLLBACK")
+                    raise
+                print "[Info] Database migrated to schema version {}".format(new_version)
+                version = new_version
+        finally:
+            conn.isolation_level = isolation_level
+
+        return version
+
+    def _v1_initial(self, cursor):
+        # schema of the original (unversioned) database
+        cursor.execute("""CREATE TABLE IF NOT EXISTS {}
+            (Idx INTEGER PRIMARY KEY AUTOINCREMENT,
+            Date TEXT,
+            Description TEXT)""".format(self.table_generics))
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS {}
+            (SysId INTEGER PRIMARY KEY,
+            Name TEXT,
+            Date TEXT,
+            Comments TEXT,
+            LastkillId TEXT,
+            LastkillDate TEXT,
+            Watchlist INTEGER)""".format(self.table_jcodes))
+
+        cursor.execute("""CREATE TABLE IF NOT EXISTS {}
+            (SysId INTEGER PRIMARY KEY,
+            Data TEXT)""".format(self.table_stats))
+
+    def _v2_typed_jcodes(self, cursor):
+        # integer kill IDs, epoch kill timestamps and indexes on the lookup columns
+        cursor.execute("""CREATE TABLE {}_v2
+            (SysId INTEGER PRIMARY KEY,
+            Name TEXT NOT NULL,
+            Date TEXT,
+            Comments TEXT,
+            LastkillId INTEGER NOT NULL DEFAULT 0,
+            LastkillTime INTEGER NOT NULL DEFAULT 0,
+            Watchlist INTEGER NOT NULL DEFAULT 1)""".format(self.table_jcodes))
+
+        cursor.execute("""INSERT INTO {0}_v2
+            SELECT SysId, Name, Date, Comments,
+                COALESCE(CAST(LastkillId AS INTEGER), 0),
+                COALESCE(CAST(strftime('%s', LastkillDate) AS INTEGER), 0),
+                Watchlist
+            FROM {0}""".format(self.table_jcodes))
+
+        cursor.execute("DROP TABLE {}".format(self.table_jcodes))
+        cursor.execute("ALTER TABLE {0}_v2 RENAME TO {0}".format(self.table_jcodes))
+        cursor.execute("CREATE INDEX {0}_name ON {0} (Name)".format(self.table_jcodes))
+        cursor.execute("CREATE INDEX {0}_watchlist ON {0} (Watchlist)".format(self.table_jcodes))
+
+    def _v3_thera_reports(self, cursor):
+        # recent Thera reports, kept across restarts to avoid duplicates
+        cursor.execute("""CREATE TABLE {}
+            (Kind TEXT NOT NULL,
+            Name TEXT NOT NULL,
+            Expiry INTEGER NOT NULL,
+            PRIMARY KEY (Kind, Name))""".format(self.table_thera))
+
+    def _v4_mass_tracker(self, cursor):
+        # wormholes spawned in the mass tracker, kept across restarts
+        cursor.execute("""CREATE TABLE {}
+            (Channel TEXT NOT NULL,
+            Signature TEXT NOT NULL,
+            State TEXT NOT NULL,
+            PRIMARY KEY (Channel, Signature))""".format(self.table_masstracker))
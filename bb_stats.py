@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+class RollingCounter:
+    """
+    Event counter over a sliding time window, kept as a ring of fixed-size buckets
+    """
+
+    def __init__(self, bucket_size, nr_buckets):
+        self.bucket_size = bucket_size  # seconds covered by one bucket
+        self.nr_buckets = nr_buckets    # window length = bucket_size * nr_buckets
+        self.buckets = [0] * nr_buckets
+        self.head = 0                   # absolute index of the most recent bucket
+        self.total = 0                  # running sum of all buckets
+
+    def _advance(self, now):
+        current = int(now) // self.bucket_size
+        if current <= self.head:
+            return
+
+        if current - self.head >= self.nr_buckets:
+            # the whole window expired
+            self.buckets = [0] * self.nr_buckets
+            self.total = 0
+        else:
+            for idx in range(self.head + 1, current + 1):
+                slot = idx % self.nr_buckets
+                self.total -= self.buckets[slot]
+                self.buckets[slot] = 0
+
+        self.head = current
+
+    def add(self, timestamp, now):
+        self._advance(now)
+        idx = min(int(timestamp) // self.bucket_size, self.head)  # clock skew: count future events as current
+
+        # events older than the window are ignored
+        if self.head - idx < self.nr_buckets:
+            self.buckets[idx % self.nr_buckets] += 1
+            self.total += 1
+
+    def count(self, now):
+        self._advance(now)
+        return self.total
+
+    def to_dict(self):
+        return {"head": self.head, "buckets": self.buckets, "total": self.total}
+
+    def load(self, data):
+        if len(data["buckets"]) == self.nr_buckets:
+            self.head = data["head"]
+            self.buckets = list(data["buckets"])
+            self.total = data["total"]
+
+
+class SystemStats:
+    """
+    Activity rollups of a single watched system
+    """
+
+    RECENT_KILLS = 5  # how many kill times should be remembered
+
+    def __init__(self):
+        self.hour = RollingCounter(60, 60)         # last hour, 1 minute buckets
+        self.day = RollingCounter(3600, 24)        # last day, 1 hour buckets
+        self.week = RollingCounter(6 * 3600, 28)   # last week, 6 hour buckets
+        self.recent = deque(maxlen=SystemStats.RECENT_KILLS)
+        self.kills = 0
+        self.thera_hits = 0
+        self.last_thera = 0
+
+    def add_kill(self, kill_time, now):
+        for counter in [self.hour, self.day, self.week]:
+            counter.add(kill_time, now)
+        self.recent.appendleft(kill_time)
+        self.kills += 1
+
+    def add_thera(self, now):
+        self.thera_hits += 1
+        self.last_thera = now
+
+    def to_dict(self):
+        return {
+            "hour": self.hour.to_dict(),
+            "day": self.day.to_dict(),
+            "week": self.week.to_dict(),
+            "recent": list(self.recent),
+            "kills": self.kills,
+            "thera_hits": self.thera_hits,
+            "last_thera": self.last_thera
+        }
+
+    @staticmethod
+    def from_dict(data):
+        stats = SystemStats()
+        stats.hour.load(data["hour"])
+        stats.day.load(data["day"])
+        stats.week.load(data["week"])
+        stats.recent.extend(data["recent"])
+        stats.kills = data["kills"]
+        stats.thera_hits = data["thera_hits"]
+        stats.last_thera = data["last_thera"]
+        return stats
+
+
+class KillStats:
+    """
+    Incrementally maintained kill activity rollups for all watched systems.
+    The poller only sees the latest kill of a system, so the counters hold the checks which found a new kill,
+    several kills of a system between two checks count as one.
+    """
+
+    def __init__(self):
+        self.__systems = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, sys_id):
+        if sys_id not in self.__systems:
+            self.__systems[sys_id] = SystemStats()
+        return self.__systems[sys_id]
+
+    def load(self, sys_id, data):
+        """
+        Restore the rollups of a system from a persisted snapshot
+        :param sys_id: Wormhole system ID
+        :param data: JSON string produced by snapshot()
+        :return: None
+        """
+        try:
+            stats = SystemStats.from_dict(json.loads(data))
+        except (ValueError, KeyError, TypeError) as e:
+            print "[Error] Unable to load stats of system {}: {}".format(sys_id, e)
+        else:
+            with self.__lock:
+                self.__systems[sys_id] = stats
+
+    def snapshot(self, sys_id):
+        with self.__lock:
+            return json.dumps(self.__get(sys_id).to_dict())
+
+    def record_kill(self, sys_id, kill_time):
+        """
+        Account a check which found a new kill
+        :param sys_id: Wormhole system ID
+        :param kill_time: Unix timestamp of the latest kill (0 if unknown)
+        :return: None
+        """
+        now = int(time.time())
+        with self.__lock:
+            self.__get(sys_id).add_kill(kill_time if kill_time > 0 else now, now)
+
+    def remove(self, sys_id):
+        with self.__lock:
+            self.__systems.pop(sys_id, None)
+
+    def clear(self):
+        with self.__lock:
+            self.__systems = {}
+
+    def record_thera(self, sys_id):
+        with self.__lock:
+            self.__get(sys_id).add_thera(int(time.time()))
+
+    def summary(self, sys_id):
+        """
+        Current rollups of a system
+        :param sys_id: Wormhole system ID
+        :return: [kills last hour, kills last day, kills last week, recent kill times, thera hits]
+        """
+        now = int(time.time())
+        with self.__lock:
+            stats = self.__systems.get(sys_id)
+            if stats is None:
+                return [0, 0, 0, [], 0]
+            return [stats.hour.count(now), stats.day.count(now), stats.week.count(now), list(stats.recent),
+                    stats.thera_hits]
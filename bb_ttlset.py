@@ -0,0 +1,90 @@
+import heapq
+import threading
+import time
+
+
+class TtlSet:
+    """
+    Bounded set whose members expire after a fixed time to live
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl                # seconds a member stays in the set
+        self.max_size = max_size      # oldest members are evicted beyond this size
+        self.__expiry = {}            # member -> expiry timestamp
+        self.__heap = []              # min-heap of (expiry timestamp, member), may hold stale entries
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__expiry)
+
+    def __contains__(self, member):
+        with self.__lock:
+            expiry = self.__expiry.get(member)
+        return expiry is not None and expiry > time.time()
+
+    def add(self, member, now=None):
+        """
+        Insert a member (or refresh its time to live)
+        :param member: Hashable member
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: None
+        """
+        now = time.time() if now is None else now
+        with self.__lock:
+            self.__push(member, now + self.ttl)
+            while len(self.__expiry) > self.max_size:
+                self.__pop()
+
+    def expire(self, now=None):
+        """
+        Remove every member whose time to live has passed
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: Number of removed members
+        """
+        now = time.time() if now is None else now
+        removed = 0
+        with self.__lock:
+            while self.__heap and self.__heap[0][0] <= now:
+                if self.__pop():
+                    removed += 1
+        return removed
+
+    def snapshot(self):
+        """
+        :return: List of [member, expiry timestamp] pairs, suitable for restore()
+        """
+        with self.__lock:
+            return [[member, expiry] for member, expiry in self.__expiry.items()]
+
+    def restore(self, items, now=None):
+        """
+        Load members from a snapshot, skipping the ones which already expired
+        :param items: List of [member, expiry timestamp] pairs
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: None
+        """
+        now = time.time() if now is None else now
+        with self.__lock:
+            for member, expiry in items:
+                if expiry > now:
+                    self.__push(member, expiry)
+            while len(self.__expiry) > self.max_size:
+                self.__pop()
+
+    def __push(self, member, expiry):
+        self.__expiry[member] = expiry
+        heapq.heappush(self.__heap, (expiry, member))
+
+        # drop stale heap entries left behind by refreshed members
+        if len(self.__heap) > 2 * len(self.__expiry) + 16:
+            self.__heap = [(expiry, member) for member, expiry in self.__expiry.items()]
+            heapq.heapify(self.__heap)
+
+    def __pop(self):
+        # remove the member which expires first, returns False if the heap entry was stale
+        expiry, member = heapq.heappop(self.__heap)
+        if self.__expiry.get(member) == expiry:
+            del self.__expiry[member]
+            return True
+        return False
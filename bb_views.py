@@ -0,0 +1,135 @@
+import bisect
+import threading
+from collections import OrderedDict
+
+
+class ListViews:
+    """
+    Pre-rendered rows and assembled list messages of the bounty orders, updated only for the rows which change
+    """
+
+    def __init__(self):
+        self.__names = []               # names of the specific orders, sorted like bountydb.list_jcode()
+        self.__short = {}               # name -> short fragment (ex. *J123450* [C2]~)
+        self.__detail = {}              # name -> str(wh)
+        self.__generic = OrderedDict()  # idx -> str(generic_wh), in insertion order
+        self.__assembled = {}      # view name -> assembled message, dropped when a row changes
+        self.__lock = threading.Lock()
+
+    # -----------------------------------------------------------------------------
+    # Row maintenance
+
+    def update_jcode(self, wh):
+        """
+        Add or re-render the row of a specific wormhole
+        :param wh: bountydb.Wormhole
+        :return: None
+        """
+        short = "*{}* [C{}]".format(wh.name, wh.whclass)
+        if not wh.watchlist:
+            short += "~"  # append special character to denote system is not actively watchlisted
+        detail = str(wh)
+
+        with self.__lock:
+            if wh.name not in self.__detail:
+                bisect.insort(self.__names, wh.name)
+            self.__short[wh.name] = short
+            self.__detail[wh.name] = detail
+            self.__assembled.pop("jcode", None)
+            self.__assembled.pop("jcode+", None)
+
+    def remove_jcode(self, name):
+        with self.__lock:
+            if name in self.__detail:
+                del self.__names[bisect.bisect_left(self.__names, name)]
+                del self.__short[name]
+                del self.__detail[name]
+                self.__assembled.pop("jcode", None)
+                self.__assembled.pop("jcode+", None)
+
+    def clear_jcodes(self):
+        with self.__lock:
+            self.__names = []
+            self.__short = {}
+            self.__detail = {}
+            self.__assembled.pop("jcode", None)
+            self.__assembled.pop("jcode+", None)
+
+    def update_generic(self, generic_wh):
+        detail = str(generic_wh)
+        with self.__lock:
+            self.__generic[generic_wh.idx] = detail
+            self.__assembled.pop("generic", None)
+
+    def remove_generic(self, idx):
+        with self.__lock:
+            if idx in self.__generic:
+                del self.__generic[idx]
+                self.__assembled.pop("generic", None)
+
+    def clear_generics(self):
+        with self.__lock:
+            self.__generic = OrderedDict()
+            self.__assembled.pop("generic", None)
+
+    # -----------------------------------------------------------------------------
+    # Views
+
+    def jcode_short(self):
+        """
+        :return: Short form of all specific orders (None if there are none)
+        """
+        with self.__lock:
+            if not self.__detail:
+                return None
+            if "jcode" not in self.__assembled:
+                self.__assembled["jcode"] = "Specific orders:\n>" + ", ".join(
+                    [self.__short[name] for name in self.__names]
+                )
+            return self.__assembled["jcode"]
+
+    def jcode_detail(self):
+        """
+        :return: Detailed rows of all specific orders (None if there are none)
+        """
+        with self.__lock:
+            if not self.__detail:
+                return None
+            if "jcode+" not in self.__assembled:
+                self.__assembled["jcode+"] = [self.__detail[name] for name in self.__names]
+            return self.__assembled["jcode+"]
+
+    def jcode_rows(self, names):
+        """
+        :param names: Upper case J-code names
+        :return: Detailed rows of the given specific orders which exist, in list order (None if there are none at all)
+        """
+        names = set(names)
+        with self.__lock:
+            if not self.__detail:
+                return None
+            return [self.__detail[name] for name in self.__names if name in names]
+
+    def generic_all(self):
+        """
+        :return: All generic orders, one per line (None if there are none)
+        """
+        with self.__lock:
+            if not self.__generic:
+                return None
+            if "generic" not in self.__assembled:
+                self.__assembled["generic"] = "Generic orders:\n" + "".join(
+                    [">" + detail + "\n" for detail in self.__generic.values()]
+                )
+            return self.__assembled["generic"]
+
+    def generic_rows(self, idx_list):
+        """
+        :param idx_list: Generic IDs
+        :return: Rows of the given generic orders which exist, in list order (None if there are no generics at all)
+        """
+        idx_list = set(idx_list)
+        with self.__lock:
+            if not self.__generic:
+                return None
+            return [detail for idx, detail in self.__generic.items() if idx in idx_list]
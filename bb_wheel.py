@@ -0,0 +1,79 @@
+import threading
+import time
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel: keys with a deadline, spread over a ring of slots one tick wide.
+    Scheduling and cancelling are O(1), expiring visits only the slots whose tick has passed,
+    so a key is removed at most one tick after its deadline.
+    Deadlines further away than one revolution wait in their slot for the following revolutions.
+    """
+
+    def __init__(self, tick, slots, now=None):
+        now = time.time() if now is None else now
+        self.tick = tick                                  # seconds covered by a slot
+        self.slots = slots                                # number of slots of the ring
+        self.__wheel = [{} for _ in range(slots)]         # slot -> {key: deadline}
+        self.__slot = {}                                  # key -> slot index
+        self.__current = int(now // tick) - 1             # last tick which has completely passed
+        self.__lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.__slot)
+
+    def schedule(self, key, deadline):
+        """
+        Add a key (or move it to a new deadline)
+        :param key: Hashable key
+        :param deadline: Unix timestamp of the expiry
+        :return: None
+        """
+        with self.__lock:
+            self.__cancel(key)
+            slot = max(int(deadline // self.tick), self.__current + 1) % self.slots
+            self.__wheel[slot][key] = deadline
+            self.__slot[key] = slot
+
+    def cancel(self, key):
+        """
+        :return: True if the key was scheduled
+        """
+        with self.__lock:
+            return self.__cancel(key)
+
+    def deadline(self, key):
+        """
+        :return: Deadline of a key, None if it is not scheduled
+        """
+        with self.__lock:
+            slot = self.__slot.get(key)
+            return self.__wheel[slot][key] if slot is not None else None
+
+    def advance(self, now=None):
+        """
+        Remove every key whose deadline has passed
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: List of [key, deadline] removed, in slot order
+        """
+        now = time.time() if now is None else now
+        target = int(now // self.tick) - 1
+        expired = []
+        with self.__lock:
+            # past one revolution, the following ticks fall on the slots already visited
+            for current in range(self.__current, self.__current + min(target - self.__current, self.slots)):
+                slot = self.__wheel[(current + 1) % self.slots]
+                for key, deadline in slot.items():
+                    if deadline <= now:
+                        del slot[key]
+                        del self.__slot[key]
+                        expired.append([key, deadline])
+            self.__current = max(self.__current, target)
+        return expired
+
+    def __cancel(self, key):
+        slot = self.__slot.pop(key, None)
+        if slot is None:
+            return False
+        del self.__wheel[slot][key]
+        return True
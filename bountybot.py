@@ -6,24 +6,41 @@ Created on 2015-06-06
 
 import os
 import random
+import time
 
 from bountydb import BountyDb
 from bountyconfig import BountyConfig
 from bb_common import BbCommon
+from bb_router import CommandRouter
+from bb_outbox import Outbox
+from bb_cache import ResponseCache
+from bb_pager import ResultSet, Pager
+from bb_quota import QuotaLimiter
+from bb_metrics import metrics
 from masscalc.whmanager import WhManager
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
 
 class BountyBot:
-    def __init__(self, talk):
+    def __init__(
+            self,
+            talk,
+            epicenter_db=None,
+            bounties_db=None,
+            channels=None,
+            epicenter=None,
+            poller=None,
+            tenant="main"
+    ):
         # Slackbot output function
         self.talk = talk
+        self.tenant = tenant  # name of the Slack team/channel configuration served
 
         # Bounty Database initialization
         self.bountydb = BountyDb(
-            os.path.join(basedir, "epicenter.db"),
-            os.path.join(basedir, "bounties.db"),
+            epicenter_db if epicenter_db else os.path.join(basedir, "epicenter.db"),
+            bounties_db if bounties_db else os.path.join(basedir, "bounties.db"),
             "wormholes",
             "generics",
             self.report_kill,
@@ -32,16 +49,19 @@ class BountyBot:
             self.report_thera_tripnull,
             BountyConfig.INTERVAL,
             BountyConfig.WAIT,
-            BountyConfig.CYCLE
+            BountyConfig.CYCLE,
+            epicenter,
+            poller
         )
         if BountyConfig.MASS_TRACKER_ENABLED:
             whmanager = WhManager(self)
         else:
             whmanager = None
+        self.whmanager = whmanager
 
         # -----------------------------------------------------------------------------
         # Channel Settings
-        self.ch = BountyConfig.get_channels()
+        self.ch = channels if channels else BountyConfig.get_channels()
         
         # Construct a list of channels where commands can be executed
         self.chlist_cfg = [self.ch["bountybot-config"]]
@@ -60,6 +80,9 @@ class BountyBot:
         
         # Each command starts with one of the following prefixes:
         self.cmd_start = ["!bountybot", "!bounty", "!bb"]
+
+        # Commands which receive their arguments line by line (rest of the first line, then every other line)
+        self.cmd_multiline = ["import"]
         
         # Command configuration list
         self.cmd_list = [
@@ -93,6 +116,12 @@ class BountyBot:
             ["static", self.chlist_all, self.cbk_static, [
                 ("<code>", "displays information on a static code (ex. D382)")
             ]],
+            ["stats", self.chlist_all, self.cbk_stats, [
+                ("[jcode]", "displays kill reports of bounty systems (last hour/day/week and Thera hits)")
+            ]],
+            ["more", self.chlist_all, self.cbk_more, [
+                ("", "displays the next page of the last search/generic/list result of the channel")
+            ]],
             # -----------------------------------------------------------------------------
             ["add", self.chlist_cfg, self.cbk_add, [
                 (
@@ -115,6 +144,16 @@ class BountyBot:
                     "modify the description of a generic wormhole"
                 )
             ]],
+            ["import", self.chlist_cfg, self.cbk_import, [
+                (
+                    "<jcode> <watchlist> <comments> [newline <jcode> <watchlist> <comments> ...]",
+                    "add many bounty systems at once, one per line; lines may also be 'generic <description>'"
+                ),
+                ("file <name>", "add bounty systems from a CSV (name, watchlist, comments) or JSON file in IMPORT_DIR")
+            ]],
+            ["export", self.chlist_cfg, self.cbk_export, [
+                ("[generic/jcode]", "export bounty systems as CSV")
+            ]],
             ["destroy", self.chlist_cfg, self.cbk_destroy, [
                 ("[generic/jcode]", "CAUTION! removes all [generic/jcode] bounty systems")
             ]],
@@ -124,18 +163,27 @@ class BountyBot:
             ["announce", self.chlist_cfg, self.cbk_announce, [
                 ("<message>", "make an announcement as Bounty Bot")
             ]],
+            ["cache", self.chlist_cfg, self.cbk_cache, [
+                ("[clear]", "displays response cache usage or clears the cache")
+            ]],
+            ["quota", self.chlist_cfg, self.cbk_quota, [
+                ("", "displays how many commands were refused because of the user/channel quotas")
+            ]],
+            ["metrics", self.chlist_cfg, self.cbk_metrics, [
+                ("[prefix]", "displays counters, gauges and latency histograms (ex. bb_command)")
+            ]],
         ]
         # -----------------------------------------------------------------------------
         if whmanager:
             self.cmd_list.append(
                 ["spawn", self.chlist_all, whmanager.cbk_spawn, [
                     ("", "view spawned wormholes in current channel"),
-                    ("<sig> <type> <state>", "spawn a wormhole")
+                    ("<sig> <type> <state> [eol]", "spawn a wormhole, tracked until the end of its stable time")
                 ]]
             )
             self.cmd_list.append(
                 ["splash", self.chlist_all, whmanager.cbk_splash, [
-                    ("<sig> <ship_mass>", "splash a wormhole with specified ship mass"),
+                    ("<sig> <ship_mass> [ship_mass ...]", "splash a wormhole with ship masses, in jump order"),
                 ]]
             )
             self.cmd_list.append(
@@ -153,51 +201,50 @@ class BountyBot:
                     ("<sig> <ship_mass>", "compute probability of wormhole collapse with specified ship mass"),
                 ]]
             )
+            self.cmd_list.append(
+                ["chance-table", self.chlist_all, whmanager.cbk_chance_table, [
+                    ("<code> <state> [ship_mass ...]", "collapse and shrink chances of a freshly reported static code"),
+                ]]
+            )
+            self.cmd_list.append(
+                ["plan", self.chlist_all, whmanager.cbk_plan, [
+                    ("<sig> <ship_mass> [ship_mass ...]", "plan the rolling of a wormhole with the specified ships"),
+                ]]
+            )
+
+        # Rendered responses of read-only commands
+        self.cache = ResponseCache(BountyConfig.CACHE_ENTRIES)
+
+        # Remaining pages of large results
+        self.pager = Pager(BountyConfig.CURSOR_TTL, BountyConfig.CURSOR_MAX)
+
+        # Command quotas
+        self.quota = QuotaLimiter(
+            BountyConfig.QUOTA_WINDOW,
+            BountyConfig.QUOTA_USER,
+            BountyConfig.QUOTA_CHANNEL,
+            BountyConfig.QUOTA_COSTS
+        )
+
+        # Command dispatcher
+        self.router = CommandRouter(self.cmd_start, self.talk, self.quota)
+        for cmd in self.cmd_list:
+            self.router.add(cmd[0], cmd[1], cmd[2], cmd[0] in self.cmd_multiline)
+
+        self.__register_metrics()
 
         # Announce that BountyBot is back online when not in development mode
         if not BountyConfig.DEBUG:
-            self.talk(self.ch["general"], "Back online")
-            self.talk(self.ch["wormhole-sales"], "Back online")
+            self.talk(self.ch["general"], "Back online", Outbox.PRIORITY_CHATTER)
+            self.talk(self.ch["wormhole-sales"], "Back online", Outbox.PRIORITY_CHATTER)
     
+    # Quota check of a message addressed to Bounty Bot, before it is queued
+    def admit_cmd(self, data):
+        return self.router.admit(data["channel"], data.get("user"), data["text"])
+
     # Command Interpreter
     def process_cmd(self, data):
-        processed_data = data["text"].encode('ascii', 'ignore').decode('ascii')
-        cmd_args = processed_data.split()
-        
-        # Check if the message is addressed to Bounty Bot
-        if cmd_args[0].lower() in self.cmd_start:
-            
-            # Is it a valid command - at least one argument and command should be in list?
-            cmd_found = False
-            if len(cmd_args) > 1:
-                for cmd in self.cmd_list:
-                    if cmd_args[1].lower() == cmd[0]:
-                        cmd_found = True
-                        
-                        # Make sure the command is executed from the correct channel
-                        if any(data["channel"].startswith(item) for item in cmd[1]):
-                            cmd[2](data["channel"], cmd_args[2:])  # ignore the first 2 arguments
-                        else:
-                            self.talk(
-                                data["channel"],
-                                "Command '{}' can not be executed from this channel".format(cmd_args[1])
-                            )
-            
-                if not cmd_found:
-                    # command not in list
-                    self.talk(
-                        data["channel"],
-                        "No such command '{}'. Type '!bb help' from a Bounty Bot channel for more info".format(
-                            cmd_args[1]
-                        )
-                    )
-            
-            else:
-                # no argument specified
-                self.talk(
-                    data["channel"],
-                    "Please specify at least one argument. Type '!bb help' from a Bounty Bot channel for more info"
-                )
+        self.router.route(data["channel"], data["text"])
     
     # Report-A-Kill callback
     def report_kill(self, wormhole):
@@ -207,7 +254,7 @@ class BountyBot:
             wormhole.sysId,
             wormhole.comments
         )
-        self.talk(self.ch["bountybot-report"], message)
+        self.talk(self.ch["bountybot-report"], message, Outbox.PRIORITY_REPORT)
 
     # Report Thera specific wormhole connection
     def report_thera(self, wormhole):
@@ -215,7 +262,7 @@ class BountyBot:
             wormhole.name,
             wormhole.comments
         )
-        self.talk(self.ch["bountybot-report"], message)
+        self.talk(self.ch["bountybot-report"], message, Outbox.PRIORITY_REPORT)
 
     # Report Thera generic wormhole connection
     def report_thera_generic(self, generic_wh, th_sys):
@@ -223,14 +270,14 @@ class BountyBot:
             generic_wh.idx,
             th_sys
         )
-        self.talk(self.ch["wormhole-sales"], message)
+        self.talk(self.ch["wormhole-sales"], message, Outbox.PRIORITY_REPORT)
 
     # Report Thera generic wormhole connection
     def report_thera_tripnull(self, th_sys):
         message = "`[THERA]` Psst! Tripnull connection detected: *{}*".format(
             th_sys
         )
-        self.talk(self.ch["wormhole-sales"], message)
+        self.talk(self.ch["wormhole-sales"], message, Outbox.PRIORITY_REPORT)
     
     # -----------------------------------------------------------------------------
     # Command callbacks
@@ -242,7 +289,7 @@ class BountyBot:
         
         for cmd in self.cmd_list:
             # Only display commands which can be executed from current channel
-            if any(channel.startswith(item) for item in cmd[1]):
+            if self.router.allowed(cmd[0], channel):
                 for cmd_flavour in cmd[3]:
                     message += ">`" + self.cmd_start[0] + " " + cmd[0] + " " + cmd_flavour[0] + "`  -- " + \
                                cmd_flavour[1] + "\n"
@@ -310,6 +357,26 @@ class BountyBot:
 
     # !bb list
     def cbk_list(self, channel, cmd_args):
+        self.__cached_talk("list", channel, cmd_args, self.__render_list)
+
+    # !bb generic
+    def cbk_generic(self, channel, cmd_args):
+        self.__cached_talk("generic", channel, cmd_args, self.__render_generic)
+
+    # !bb info
+    def cbk_info(self, channel, cmd_args):
+        self.__cached_talk("info", channel, cmd_args, self.__render_info)
+
+    # !bb search
+    def cbk_search(self, channel, cmd_args):
+        self.__cached_talk("search", channel, cmd_args, self.__render_search)
+
+    # !bb static
+    def cbk_static(self, channel, cmd_args):
+        self.__cached_talk("static", channel, cmd_args, self.__render_static)
+
+    # Response of !bb list
+    def __render_list(self, cmd_args):
         if len(cmd_args) == 0:
             message = self.__list_generic()
             message += "\n"
@@ -324,10 +391,10 @@ class BountyBot:
             else:
                 message = BountyBot.cmd_error("list", "2nd argument must be either 'generic', 'jcode' or 'jcode+'")
         
-        self.talk(channel, message)
+        return message
 
-    # !bb generic
-    def cbk_generic(self, channel, cmd_args):
+    # Response of !bb generic
+    def __render_generic(self, cmd_args):
         if len(cmd_args) >= 1:
             idx = cmd_args[0]
             
@@ -337,15 +404,7 @@ class BountyBot:
                 jcodes = self.bountydb.generic_jcodes(idx)
                 if jcodes is not None:
                     if jcodes:
-                        message = "Matches: {}.".format(len(jcodes))
-                        
-                        if len(jcodes) > BountyConfig.SEARCH_RESULTS:
-                            message += " Results limited to {}.".format(BountyConfig.SEARCH_RESULTS)
-                        
-                        message += "```"
-                        message += " ".join(jcodes[:BountyConfig.SEARCH_RESULTS])
-                        message += "```"
-                    
+                        message = ResultSet("Matches: {}.".format(len(jcodes)), jcodes)
                     else:
                         message = "Generic #{} has no associated J-codes".format(idx)
                 else:
@@ -354,13 +413,12 @@ class BountyBot:
             else:
                 message = BountyBot.cmd_error("generic", "'{}' is not a number".format(idx))
                 
-            # display result of operation
-            self.talk(channel, message)
+            return message
         else:
-            self.talk(channel, BountyBot.invalid_arg("generic", 1))
+            return BountyBot.invalid_arg("generic", 1)
 
-    # !bb info
-    def cbk_info(self, channel, cmd_args):
+    # Response of !bb info
+    def __render_info(self, cmd_args):
         if len(cmd_args) >= 1:
             message_list = []
             
@@ -368,37 +426,54 @@ class BountyBot:
             for name in name_list:
                 message_list.append(self.bountydb.info_jcode(name))
             
-            self.talk(channel, "\n".join(message_list))
+            return "\n".join(message_list)
         else:
-            self.talk(channel, BountyBot.invalid_arg("info", 1))
+            return BountyBot.invalid_arg("info", 1)
 
-    # !bb search
-    def cbk_search(self, channel, cmd_args):
+    # Response of !bb search
+    def __render_search(self, cmd_args):
         if len(cmd_args) >= 1:
             description = " ".join(cmd_args)
             [result_info, jcodes] = self.bountydb.search_generic(description)
-            
-            message = result_info
-            if len(jcodes) > BountyConfig.SEARCH_RESULTS:
-                message += " Results limited to {}.".format(BountyConfig.SEARCH_RESULTS)
-            
-            if len(jcodes) > 0:
-                message += "```"
-                message += " ".join(jcodes[:BountyConfig.SEARCH_RESULTS])
-                message += "```"
-                    
-            self.talk(channel, message)
+            return ResultSet(result_info, jcodes)
         else:
-            self.talk(channel, BountyBot.invalid_arg("search", 1))
+            return BountyBot.invalid_arg("search", 1)
 
-    # !bb static
-    def cbk_static(self, channel, cmd_args):
+    # Response of !bb static
+    def __render_static(self, cmd_args):
         if len(cmd_args) >= 1:
             static_code = cmd_args[0]
             message = self.bountydb.search_static(static_code)
-            self.talk(channel, message)
+            return message
+        else:
+            return BountyBot.invalid_arg("static", 1)
+
+    # !bb stats
+    def cbk_stats(self, channel, cmd_args):
+        if len(cmd_args) >= 1:
+            message_list = []
+
+            name_list = cmd_args[0:BountyConfig.MAX_PARAMETER]
+            for name in name_list:
+                summary = self.bountydb.stats_jcode(name)
+                if summary is not None:
+                    message_list.append(BountyBot.__format_stats(name.upper(), summary, detailed=True))
+                else:
+                    message_list.append("*{}* not in specific orders list".format(name.upper()))
+
+            message = "\n".join(message_list)
         else:
-            self.talk(channel, BountyBot.invalid_arg("static", 1))
+            output_list = [[summary[2], summary[1], wh.name, summary] for [wh, summary] in self.bountydb.stats_all()]
+
+            if output_list:
+                # most active systems first
+                output_list.sort(key=lambda x: (-x[0], -x[1], x[2]))
+                message = "Kill activity (hour/day/week, Thera hits):\n"
+                message += "\n".join([BountyBot.__format_stats(name, summary) for [_, _, name, summary] in output_list])
+            else:
+                message = "J-code list is empty"
+
+        self.talk(channel, message)
 
     # !bb add
     def cbk_add(self, channel, cmd_args):
@@ -508,6 +583,103 @@ class BountyBot:
         else:
             self.talk(channel, BountyBot.invalid_arg("edit", 2))
     
+    # !bb import
+    def cbk_import(self, channel, cmd_lines):
+        if len(cmd_lines) >= 1:
+            message = ""
+
+            if cmd_lines[0].lower().startswith("file ") and len(cmd_lines) == 1:
+                # import from a file
+                file_name = cmd_lines[0][len("file "):].strip()
+                file_path = BountyBot.import_path(file_name)
+                jcode_entries = []
+                if file_path is None:
+                    message = BountyBot.cmd_error(
+                        "import", "'{}' is not a file of the import directory".format(file_name)
+                    )
+                else:
+                    try:
+                        jcode_entries = self.bountydb.read_orders(file_path)
+                    except (IOError, ValueError, KeyError, TypeError, AttributeError) as e:
+                        message = BountyBot.cmd_error("import", "unable to read '{}': {}".format(file_name, e))
+                generic_entries = []
+            else:
+                # import from the message, one bounty system per line
+                jcode_entries = []
+                generic_entries = []
+                errors = []
+                for line in cmd_lines:
+                    line_args = line.split()
+                    if line_args[0].lower() == "generic" and len(line_args) >= 2:
+                        generic_entries.append(" ".join(line_args[1:]))
+                    elif len(line_args) >= 3 and line_args[1].lower() in ["true", "false"]:
+                        jcode_entries.append([line_args[0], line_args[1].lower() == "true", " ".join(line_args[2:])])
+                    else:
+                        errors.append("'{}' - expected <jcode> <watchlist> <comments>".format(line))
+
+                if errors:
+                    # refuse to import anything if the message is malformed
+                    jcode_entries = []
+                    generic_entries = []
+                    message = BountyBot.cmd_error("import", "\n".join(errors))
+
+            if jcode_entries or generic_entries:
+                [wh_added, errors] = self.bountydb.import_jcodes(jcode_entries)
+                generics_added = self.bountydb.import_generics(generic_entries)
+
+                message = "Imported {} specific and {} generic order(s)".format(len(wh_added), len(generics_added))
+                if wh_added:
+                    message += "\n>" + ", ".join(["*{}*".format(wh.name) for wh in wh_added])
+                for generic_wh in generics_added:
+                    message += "\n>" + str(generic_wh)
+                if errors:
+                    message += "\nSkipped:\n>" + "\n>".join(errors)
+            elif message == "":
+                message = "Nothing to import"
+
+            self.talk(channel, message)
+            print "[Op] Import:", message
+        else:
+            self.talk(channel, BountyBot.invalid_arg("import", 1))
+
+    # path of a file of the import directory, None if imports from files are disabled or the name leaves the directory
+    @staticmethod
+    def import_path(file_name):
+        if not BountyConfig.IMPORT_DIR:
+            return None
+
+        import_dir = os.path.realpath(os.path.join(basedir, BountyConfig.IMPORT_DIR))
+        file_path = os.path.realpath(os.path.join(import_dir, file_name))
+        if not file_path.startswith(import_dir + os.sep):
+            return None
+        return file_path
+
+    # !bb export
+    def cbk_export(self, channel, cmd_args):
+        if len(cmd_args) == 0:
+            line_sources = [self.bountydb.export_generics(), self.bountydb.export_jcodes()]
+        elif cmd_args[0].lower() in ["generic", "generics"]:
+            line_sources = [self.bountydb.export_generics()]
+        elif cmd_args[0].lower() in ["jcode", "jcodes"]:
+            line_sources = [self.bountydb.export_jcodes()]
+        else:
+            self.talk(channel, BountyBot.cmd_error("export", "2nd argument must be either 'generic' or 'jcode'"))
+            return
+
+        # send the rows in chunks as they are read from the database
+        for lines in line_sources:
+            chunk = []
+            chunk_size = 0
+            for line in lines:
+                if chunk and chunk_size + len(line) + 1 > BountyConfig.EXPORT_CHUNK:
+                    self.talk(channel, "```" + "\n".join(chunk) + "```")
+                    chunk = []
+                    chunk_size = 0
+                chunk.append(line)
+                chunk_size += len(line) + 1
+            if chunk:
+                self.talk(channel, "```" + "\n".join(chunk) + "```")
+
     # !bb destroy
     def cbk_destroy(self, channel, cmd_args):
         if len(cmd_args) == 0:
@@ -535,7 +707,7 @@ class BountyBot:
             [target_msg, _] = self.bountydb.shortlink(" ".join(cmd_args[1:]))
             
             if target_channel in self.ch.keys():
-                self.talk(self.ch[target_channel], target_msg)
+                self.talk(self.ch[target_channel], target_msg, Outbox.PRIORITY_CHATTER)
             else:
                 self.talk(channel, BountyBot.cmd_error("echo", "invalid channel name"))
         else:
@@ -545,83 +717,197 @@ class BountyBot:
     def cbk_announce(self, channel, cmd_args):
         if len(cmd_args) >= 1:
             target_msg = " ".join(cmd_args[0:])
-            self.talk(self.ch["general"], target_msg)
-            self.talk(self.ch["wormhole-sales"], target_msg)
+            self.talk(self.ch["general"], target_msg, Outbox.PRIORITY_CHATTER)
+            self.talk(self.ch["wormhole-sales"], target_msg, Outbox.PRIORITY_CHATTER)
         else:
             self.talk(channel, BountyBot.invalid_arg("announce", 1))
 
+    # !bb cache
+    def cbk_cache(self, channel, cmd_args):
+        if len(cmd_args) >= 1 and cmd_args[0].lower() == "clear":
+            self.cache.clear()
+            message = "Response cache has been cleared"
+        else:
+            message = "Response cache: {} entries, {:.1f} kB, hit ratio {:.1f}% ({} hits, {} misses)".format(
+                len(self.cache),
+                self.cache.memory() / 1024.0,
+                self.cache.hit_ratio() * 100,
+                self.cache.hits,
+                self.cache.misses
+            )
+        self.talk(channel, message)
+
+    # !bb more
+    def cbk_more(self, channel, _):
+        message = self.pager.more(channel)
+        if message is None:
+            message = "No more results. Run a search, generic or list command first"
+        self.talk(channel, message)
+
+    # !bb quota
+    def cbk_quota(self, channel, _):
+        message = "Commands admitted: {}, refused: {} (user quota: {}, channel quota: {})".format(
+            self.quota.admitted,
+            self.quota.shed_total(),
+            self.quota.shed[QuotaLimiter.SHED_USER],
+            self.quota.shed[QuotaLimiter.SHED_CHANNEL]
+        )
+        if self.quota.shed_commands:
+            message += "\nRefused by command: " + ", ".join(
+                ["{} `{}`".format(name, count) for name, count in sorted(
+                    self.quota.shed_commands.items(), key=lambda item: -item[1]
+                )]
+            )
+        self.talk(channel, message)
+
+    # !bb metrics
+    def cbk_metrics(self, channel, cmd_args):
+        prefix = cmd_args[0].lower() if len(cmd_args) >= 1 else ""
+        rows = []
+        for [name, metric_type, _, family] in metrics.collect(prefix):
+            for labels, metric in family:
+                row = name
+                if labels:
+                    row += "{" + ",".join(["{}={}".format(key, value) for key, value in labels]) + "}"
+                if metric_type == "histogram":
+                    if metric.count:
+                        row += " count={} mean={} p50<={} p99<={}".format(
+                            metric.count,
+                            BountyBot.__format_seconds(metric.mean()),
+                            BountyBot.__format_seconds(metric.quantile(0.5)),
+                            BountyBot.__format_seconds(metric.quantile(0.99))
+                        )
+                    else:
+                        row += " count=0"
+                else:
+                    row += " {}".format(metric.get())
+                rows.append(row)
+
+        if rows:
+            message = self.pager.start(
+                channel, ResultSet("Metrics:", rows, "\n").pages(BountyConfig.PAGE_LENGTH, BountyConfig.SEARCH_RESULTS)
+            )
+        else:
+            message = "No metrics found starting with '{}'".format(prefix)
+        self.talk(channel, message)
+
     # -----------------------------------------------------------------------------
     # Helper functions
 
+    # Counters and gauges of the caches, cursors and quotas of this tenant
+    def __register_metrics(self):
+        tenant = {"tenant": self.tenant}
+        metrics.gauge("bb_cache_entries", "Cached command responses", tenant, lambda: len(self.cache))
+        metrics.gauge("bb_cache_bytes", "Approximate size of the cached responses", tenant, self.cache.memory)
+        metrics.counter("bb_cache_hits_total", "Response cache hits", tenant, lambda: self.cache.hits)
+        metrics.counter("bb_cache_misses_total", "Response cache misses", tenant, lambda: self.cache.misses)
+        metrics.gauge("bb_pager_cursors", "Channels with remaining result pages", tenant, lambda: len(self.pager))
+        metrics.counter("bb_quota_admitted_total", "Commands admitted by the quotas", tenant,
+                        lambda: self.quota.admitted)
+        if self.whmanager:
+            metrics.gauge("bb_masstracker_wormholes", "Spawned wormholes tracked", tenant,
+                          lambda: len(self.whmanager.store))
+            metrics.counter("bb_masstracker_expired_total", "Spawned wormholes removed at the end of their lifetime",
+                            tenant, lambda: self.whmanager.expired)
+        for reason in [QuotaLimiter.SHED_USER, QuotaLimiter.SHED_CHANNEL]:
+            metrics.counter(
+                "bb_quota_shed_total", "Commands refused by the quotas",
+                {"tenant": self.tenant, "reason": reason}, lambda reason=reason: self.quota.shed[reason]
+            )
+
+    # Human readable duration of a histogram statistic
+    @staticmethod
+    def __format_seconds(seconds):
+        if seconds == float("inf"):
+            return "inf"
+        elif seconds < 1:
+            return "{:.1f}ms".format(seconds * 1000)
+        else:
+            return "{:.1f}s".format(seconds)
+
+    # Answer a read-only command from the response cache, rendering it only if the orders changed meanwhile
+    def __cached_talk(self, cmd_name, channel, cmd_args, render):
+        channel_class = "cfg" if channel in self.chlist_cfg else channel[:1]
+        key = (cmd_name, tuple([arg.lower() for arg in cmd_args]), channel_class)
+        version = self.bountydb.version
+
+        message = self.cache.get(key, version)
+        if message is None:
+            message = render(cmd_args)
+            self.cache.put(key, version, message)
+
+        # large results are posted one page at a time, the rest waits for !bb more
+        if isinstance(message, ResultSet):
+            message = self.pager.start(
+                channel, message.pages(BountyConfig.PAGE_LENGTH, BountyConfig.SEARCH_RESULTS)
+            )
+
+        self.talk(channel, message)
+
     # List only generic wormholes
     def __list_generic(self, generic_args=None):
-        generic_list = self.bountydb.list_generic()
-
-        if len(generic_list) > 0:
-            if generic_args:
-                # list only the specified IDs
-                generic_args_int = [int(gen_id) for gen_id in generic_args if BbCommon.represents_int(gen_id)]
-                message = ""
-                found = False
-                for wh_gen in generic_list:
-                    if wh_gen.idx in generic_args_int:
-                        message += ">" + str(wh_gen) + "\n"
-                        found = True
-                if not found:
-                    message += "No generic orders found with the given id(s)!"
-            else:
-                # list all generics
-                message = "Generic orders:\n"
-                for wh_gen in generic_list:
-                    message += ">" + str(wh_gen) + "\n"
+        views = self.bountydb.views
 
+        if generic_args:
+            # list only the specified IDs
+            generic_args_int = [int(gen_id) for gen_id in generic_args if BbCommon.represents_int(gen_id)]
+            rows = views.generic_rows(generic_args_int)
+            if rows is None:
+                message = "Generic wormhole list is empty"
+            elif rows:
+                message = "".join([">" + row + "\n" for row in rows])
+            else:
+                message = "No generic orders found with the given id(s)!"
         else:
-            message = "Generic wormhole list is empty"
+            # list all generics
+            message = views.generic_all()
+            if message is None:
+                message = "Generic wormhole list is empty"
 
         return message
     
     # List short J-codes
     def __list_jcode(self, jcode_args=None):
-        jcode_list = self.bountydb.list_jcode()
-        
-        if len(jcode_list) > 0:
-            if jcode_args:
-                # list only the specified J-code(s)
-                jcode_args = [x.upper() for x in jcode_args]
-                message = ""
-                found = False
-                for wh in jcode_list:
-                    if wh.name in jcode_args:
-                        message += str(wh) + "\n"
-                        found = True
-                if not found:
-                    message += "No specific orders found with the given J-code(s)!"
+        views = self.bountydb.views
+
+        if jcode_args:
+            # list only the specified J-code(s)
+            rows = views.jcode_rows([x.upper() for x in jcode_args])
+            if rows is None:
+                message = "J-code list is empty"
+            elif rows:
+                message = "".join([row + "\n" for row in rows])
             else:
-                # list all J-codes (short form)
-                output_list = []
-                for wh in jcode_list:
-                    wh_element = "*{}* [C{}]".format(wh.name, wh.whclass)
-                    if not wh.watchlist:
-                        wh_element += "~"  # append special character to denote system is not actively watchlisted
-                    output_list += [wh_element]
-
-                message = "Specific orders:\n>" + ", ".join(output_list)
+                message = "No specific orders found with the given J-code(s)!"
         else:
-            message = "J-code list is empty"
+            # list all J-codes (short form)
+            message = views.jcode_short()
+            if message is None:
+                message = "J-code list is empty"
             
         return message
     
     # List J-codes with details
     def __list_jcode_detail(self):
-        message = ""
-        jcode_list = self.bountydb.list_jcode()
-        
-        if len(jcode_list) > 0:
-            for wh in self.bountydb.list_jcode():
-                message += str(wh) + "\n"
-        else:
-            message = "J-code list is empty"
+        rows = self.bountydb.views.jcode_detail()
+        if rows is None:
+            return "J-code list is empty"
             
+        return ResultSet("", rows, "\n", False)
+
+    # Human readable activity rollups of a system
+    @staticmethod
+    def __format_stats(name, summary, detailed=False):
+        [kills_hour, kills_day, kills_week, recent, thera_hits] = summary
+        message = ">*{}* - Kills: `{}`/`{}`/`{}`, Thera: `{}`".format(
+            name, kills_hour, kills_day, kills_week, thera_hits
+        )
+
+        if detailed and recent:
+            message += ", Recent kills: " + ", ".join(
+                [time.strftime("%Y-%m-%d %H:%M", time.gmtime(kill_time)) for kill_time in recent]
+            )
+
         return message
 
     # Called when a command has incorrect number arguments
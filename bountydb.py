@@ -6,17 +6,26 @@ Created on 2015-05-11
 
 import time
 import urllib2
-import sqlite3 as lite
 import gzip
 import json
 import threading
 import re
+import csv
+from multiprocessing.pool import ThreadPool
+from contextlib import contextmanager
 
 from epicenter import Epicenter
 from StringIO import StringIO
 from bountyconfig import BountyConfig
-from evescout.evescout import EveScout
+from bb_common import BbCommon
+from bb_stats import KillStats
+from bb_schema import BountySchema
+from bb_ttlset import TtlSet
+from bb_views import ListViews
+from bb_poller import KillPoller
+from bb_metrics import metrics
 from tripwire.tripwire_sql import TripwireSql
+from tripwire.tripwire_pool import TripwirePool
 
 
 class Zkb():
@@ -24,8 +33,33 @@ class Zkb():
     Zkillboard Handling Class
     """
 
+    requests = metrics.counter("bb_upstream_requests_total", "Upstream API requests", {"upstream": "zkillboard"})
+    errors = metrics.counter("bb_upstream_errors_total", "Failed upstream API requests", {"upstream": "zkillboard"})
+    latency = metrics.histogram(
+        "bb_upstream_request_seconds", "Upstream API request time [seconds]", {"upstream": "zkillboard"}
+    )
+
+    # [killID, killTime] of the latest kill, None if the request failed or there is no kill in the system
     @staticmethod
     def lastkill(solarSystemID, limit = 1):
+        kills = Zkb.kills(solarSystemID, limit)
+        return kills[0] if kills else None
+
+    # list of [killID, killTime], latest first (empty if there is no kill in the system), None if the request failed
+    @staticmethod
+    def kills(solarSystemID, limit = 1):
+        start = time.time()
+        Zkb.requests.inc()
+        try:
+            zkbInfo = Zkb.__request(solarSystemID, limit)
+        finally:
+            Zkb.latency.observe(time.time() - start)
+        if zkbInfo is None:
+            Zkb.errors.inc()
+        return zkbInfo
+
+    @staticmethod
+    def __request(solarSystemID, limit):
         headers = {
             "User-Agent": BountyConfig.USER_AGENT,
             "Accept-encoding": "gzip"
@@ -51,13 +85,15 @@ class Zkb():
             except ValueError as e:
                 print "[Error]", e
             else:
-                if len(parsed_json) > 0:
-                    return [str(parsed_json[0]['killID']), parsed_json[0]['killTime']]
+                return [[int(kill['killID']), kill['killTime']] for kill in parsed_json]
         
         return None
 
 # data structure for a wormhole system
 class Wormhole():
+    PENDING = 0               # lastkillId of a system still waiting for its Zkillboard seed
+    PENDING_DATE = "pending"  # lastkillDate of a system still waiting for its Zkillboard seed
+
     def __init__(self, sysId, name, whclass, date, comments, lastkillId, lastkillDate, watchlist):
         self.sysId = sysId                # internal Eve Id of system [private]
         self.name = name                  # name of the wormhole (ex. J123450)
@@ -67,6 +103,9 @@ class Wormhole():
         self.lastkillId = lastkillId      # last kill Id in the system [private]
         self.lastkillDate = lastkillDate  # last kill date in the system
         self.watchlist = watchlist        # should bountybot report kills in system? True/False
+
+    def pending(self):
+        return self.lastkillId == Wormhole.PENDING
         
     def __str__(self):
         return "*{}* [C{}] - Created: {}, Watchlist: {}, LastKill: {}, Info: *{}*".format(
@@ -102,7 +141,9 @@ class BountyDb():
             report_thera_tripnull,
             interval,
             apiwait,
-            cyclelimit
+            cyclelimit,
+            epicenter=None,
+            poller=None
     ):
         # initialize instance variables
         self.__db_epicenter = db_epicenter                    # Epicenter database name
@@ -113,39 +154,38 @@ class BountyDb():
         self.__report_thera = report_thera                    # callback report function for Thera connection
         self.__report_thera_generic = report_thera_generic    # callback report function for Thera connection
         self.__report_thera_tripnull = report_thera_tripnull  # callback report function for Thera connection
-        self.__interval = interval                            # period (seconds) of the __check() function
-        self.__apiwait = apiwait                              # wait time between Zkillboard api calls
-        self.__cyclelimit = cyclelimit                        # limit cycle ugly hack ;)
-        self.__cycle = 0                                      # cycle counter init to 0
+        self.__interval = interval                            # period (seconds) of the kill checks
+        self.__table_stats = "stats"                          # SQLite activity rollups table name
+        self.__table_thera = "thera"                          # SQLite recent Thera reports table name
+        self.__table_masstracker = "masstracker"              # SQLite mass tracker wormholes table name
         
         self.__whlist = []          # wormhole list
         self.__generics = []        # generics list
-        self.__thera_recent = {}    # thera recent specific reports
-        self.__thera_generic = {}   # thera recent generic reports
-        self.__thera_tripnull = {}  # thera recent tripnull reports
+        self.__thera_recent = TtlSet(BountyConfig.THERA_HOURS * 3600, BountyConfig.THERA_MAX)    # specific reports
+        self.__thera_generic = TtlSet(BountyConfig.THERA_HOURS * 3600, BountyConfig.THERA_MAX)   # generic reports
+        self.__thera_tripnull = TtlSet(BountyConfig.THERA_HOURS * 3600, BountyConfig.THERA_MAX)  # tripnull reports
+        self.__stats = KillStats()  # kill activity rollups
+        self.__polled = {}          # sysId -> wormhole checked in the current poller cycle
+
+        # background executor for Zkillboard seeding of new systems
+        self.__seed_pool = ThreadPool(BountyConfig.SEED_THREADS)
         
-        # create Epicenter instance
-        self.__epi = Epicenter(self.__db_epicenter, "wormholes", "statics")
+        # create Epicenter instance, unless one is shared by several bounty databases
+        if epicenter is None:
+            epicenter = Epicenter(self.__db_epicenter, "wormholes", "statics")
+        self.__epi = epicenter
         
-        # database handling
-        self.__db_con = lite.connect(self.__db_name)
+        # database handling, create or upgrade the tables
+        self.__db_con = BountySchema.connect(self.__db_name, shared=True)
         self.__cursor = self.__db_con.cursor()
-        
-        # create generic wormholes table
-        self.__cursor.execute("""CREATE TABLE IF NOT EXISTS {}
-            (Idx INTEGER PRIMARY KEY AUTOINCREMENT,
-            Date TEXT,
-            Description TEXT)""".format(self.__table_generics))
-        
-        #create jcode table
-        self.__cursor.execute("""CREATE TABLE IF NOT EXISTS {}
-            (SysId INTEGER PRIMARY KEY,
-            Name TEXT,
-            Date TEXT,
-            Comments TEXT,
-            LastkillId TEXT,
-            LastkillDate TEXT,
-            Watchlist INTEGER)""".format(self.__table_jcodes))
+        self.__lock = threading.RLock()  # serializes commands using the shared connection
+        self.__version_lock = threading.Lock()
+        self.version = 0                 # increased on every change of the bounty orders
+        self.views = ListViews()         # pre-rendered list messages
+        BountySchema(
+            self.__table_jcodes, self.__table_generics, self.__table_stats, self.__table_thera,
+            self.__table_masstracker
+        ).migrate(self.__db_con)
         
         # fetch values from the database (if any)
         print "-- Database contents:"
@@ -153,26 +193,54 @@ class BountyDb():
         for row in self.__cursor.execute("SELECT * FROM {} ORDER BY Idx ASC".format(self.__table_generics)):
             [result_info, jcodes] = self.__epi.computeGeneric(row[2])
             self.__generics.append(GenericWh(row[0], row[1], row[2], jcodes))
+            self.views.update_generic(self.__generics[-1])
             print row
             print result_info
         
         print ""
         
         print "Table '{}':".format(self.__table_jcodes)
-        for row in self.__cursor.execute("SELECT * FROM {} ORDER BY Name ASC".format(self.__table_jcodes)):
+        statement = """SELECT SysId, Name, Date, Comments, LastkillId, LastkillTime, Watchlist
+            FROM {} ORDER BY Name ASC""".format(self.__table_jcodes)
+        for row in self.__cursor.execute(statement):
             print row
             if int(row[6] > 0):
                 watchlist = True
             else:
                 watchlist = False
-            self.__whlist.append(Wormhole(row[0], row[1], self.__epi.getClass(row[1]), row[2], row[3], row[4], row[5], watchlist))
+            if row[4] == Wormhole.PENDING:
+                lastkillDate = Wormhole.PENDING_DATE
+            else:
+                lastkillDate = BbCommon.date_str(row[5])
+            self.__whlist.append(Wormhole(
+                row[0], row[1], self.__epi.getClass(row[1]), row[2], row[3], row[4], lastkillDate, watchlist
+            ))
+            self.views.update_jcode(self.__whlist[-1])
+
+        for row in self.__cursor.execute("SELECT SysId, Data FROM {}".format(self.__table_stats)):
+            self.__stats.load(row[0], row[1])
+
+        for kind, thera_set in self.__thera_sets():
+            statement = "SELECT Name, Expiry FROM {} WHERE Kind=?".format(self.__table_thera)
+            thera_set.restore(self.__cursor.execute(statement, (kind,)).fetchall())
         print "--"
         print ""
+
+        # resume seeding of systems added right before a restart
+        self.__seed_jcodes([wh for wh in self.__whlist if wh.pending()])
         
+        # kills and Thera connections are checked by a poller, which may be shared by several bounty databases
+        # (a shared poller is started by its owner, once every database is registered)
+        own_poller = poller is None
+        if own_poller:
+            poller = KillPoller(interval, apiwait, cyclelimit, Zkb.lastkill)
+        poller.register(self)
+
         # begin checking for kills if enabled
         if BountyConfig.REPORTS_ACTIVE:
             print "[Info] Bounty Bot manager loaded - check at every {} seconds".format(self.__interval)
-            self.__start_check()
+            if own_poller:
+                poller.start()
     
     # check if the input parameter is a valid wormhole (found in Epicenter database)
     def valid_wormhole(self, name):
@@ -186,6 +254,7 @@ class BountyDb():
     
     # get overall information on a wormhole
     def info_jcode(self, name):
+        start = time.time()
         name = name.upper()                # ignore case
         sysId = self.__epi.getSysId(name)  # retrieve the solar system Id from Epicenter Database
         
@@ -195,7 +264,8 @@ class BountyDb():
             message += self.__epi.planets(name)
         else:
             message = "Unknown wormhole name '{}'".format(name.upper())
-            
+
+        self.__catalog_timing("info").observe(time.time() - start)
         return message
     
     # get overall information on a wormhole
@@ -231,181 +301,401 @@ class BountyDb():
 
     # add a new wormhole (if valid)
     def add_jcode(self, name, watchlist, comments):
-        name = name.upper()                # ignore case
-        sysId = self.__epi.getSysId(name)  # retrieve the solar system Id from Epicenter Database
+        with self.__lock:
+            name = name.upper()                # ignore case
+            sysId = self.__epi.getSysId(name)  # retrieve the solar system Id from Epicenter Database
         
-        # check if system name is a valid Wormhole
-        if sysId > 0:
-            # make sure the system isn't already in the whlist
-            if self.get_jcode(name) == None:
-                # fetch Zkillboard data and check if anything was received
-                zkbInfo = Zkb.lastkill(sysId)
-                if zkbInfo:
-                    [lastkillId, lastkillDate] = zkbInfo
+            # check if system name is a valid Wormhole
+            if sysId > 0:
+                # make sure the system isn't already in the whlist
+                if self.get_jcode(name) == None:
+                    # build the new wormhole, Zkillboard data will be fetched in the background
+                    [wh, trip_comments] = self.__new_jcode(sysId, name, watchlist, comments)
+                    self.__whlist.append(wh)
+                    self.views.update_jcode(wh)
+
+                    # add tripwire comments
+                    if BountyConfig.TRIP_INFO["enabled"]:
+                        tripwire_thread = threading.Thread(
+                            target=self.tripwire_add_or_update,
+                            args=(sysId, trip_comments)
+                        )
+                        tripwire_thread.daemon = True
+                        tripwire_thread.start()
+
+                    # database insert
+                    statement = "INSERT INTO {} VALUES (?, ?, ?, ?, ?, ?, ?)".format(self.__table_jcodes)
+                    self.__cursor.execute(statement, self.__jcode_row(wh))
+                    self.__commit()
+                    self.__seed_jcodes([wh])
+                    return str(wh)  # all OK :)
                 else:
-                    lastkillId = 1
-                    lastkillDate = '2016-01-01 00:00:00'
+                    return "{} - already in the list".format(name)
+            else:
+                return "{} - not a valid wormhole".format(name)
+    
+    # commit the shared connection and announce the change of the bounty orders
+    def __commit(self):
+        self.__db_con.commit()
+        self.__bump_version()
+
+    def __bump_version(self):
+        with self.__version_lock:
+            self.version += 1
+
+    # construct a new wormhole from the user input, pending its Zkillboard seed
+    def __new_jcode(self, sysId, name, watchlist, comments):
+        [bb_comments, trip_comments] = self.shortlink(comments)
+        creation_date = time.strftime("%Y-%m-%d")
+        whclass = self.__epi.getClass(name)
+        wh = Wormhole(
+            sysId, name, whclass, creation_date, bb_comments, Wormhole.PENDING, Wormhole.PENDING_DATE, watchlist
+        )
+        return [wh, trip_comments]
+
+    # fetch the last kill of the given wormholes on the background executor
+    def __seed_jcodes(self, wh_list):
+        if wh_list:
+            self.__seed_pool.map_async(
+                BountyDb.__seed_fetch,
+                [wh.sysId for wh in wh_list],
+                callback=lambda zkb_list: self.__seed_done(wh_list, zkb_list)
+            )
+
+    # Zkillboard request of the seeding executor: list of kills, None if it failed
+    @staticmethod
+    def __seed_fetch(sysId):
+        try:
+            return Zkb.kills(sysId)
+        except Exception as e:
+            print "[Error] Zkillboard seed of {} failed: {}".format(sysId, e)
+            return None
+
+    # store the seeded last kills (called from the only result thread of the seeding executor, must not raise)
+    def __seed_done(self, wh_list, zkb_list):
+        # systems whose request failed stay pending, they would report an old kill as new otherwise
+        retry = [wh for wh, kills in zip(wh_list, zkb_list) if kills is None]
+        try:
+            updates = []
+            for wh, kills in zip(wh_list, zkb_list):
+                if kills:
+                    [lastkillId, lastkillDate] = kills[0]
+                    updates.append([lastkillId, lastkillDate, wh.name])
+                elif kills is not None:
+                    # no kill in the system yet
+                    updates.append([1, '2016-01-01 00:00:00', wh.name])
+
+            if updates:
+                self.__update_sqlite(self.__db_name, self.__table_jcodes, updates)
+                for [lastkillId, lastkillDate, name] in updates:
+                    self.__update_whlist(lastkillId, lastkillDate, name)
+                print "[Info] Seeded last kill of: {}".format(", ".join([name for [_, _, name] in updates]))
+        except Exception as e:
+            print "[Error] Unable to store the Zkillboard seed: {}".format(e)
+            retry = wh_list
+
+        if retry:
+            print "[Info] Seeding of {} retried in {} seconds".format(
+                ", ".join([wh.name for wh in retry]), BountyConfig.SEED_RETRY
+            )
+            retry_thread = threading.Timer(BountyConfig.SEED_RETRY, self.__seed_retry, (retry,))
+            retry_thread.daemon = True
+            retry_thread.start()
 
-                # all information is available, proceed to database addition
-                [bb_comments, trip_comments] = self.shortlink(comments)
-                creation_date = time.strftime("%Y-%m-%d")
-                whclass = self.__epi.getClass(name)
-                wh = Wormhole(sysId, name, whclass, creation_date, bb_comments, lastkillId, lastkillDate, watchlist)
-                self.__whlist.append(wh)
+    # seed again the systems which are still pending and were not removed in the meantime
+    def __seed_retry(self, wh_list):
+        with self.__lock:
+            waiting = [wh for wh in wh_list if wh.pending() and wh in self.__whlist]
+        self.__seed_jcodes(waiting)
 
-                # add tripwire comments
+    # database row of a wormhole
+    @staticmethod
+    def __jcode_row(wh):
+        return (
+            wh.sysId, wh.name, wh.date, wh.comments, wh.lastkillId, BbCommon.epoch(wh.lastkillDate),
+            1 if wh.watchlist else 0
+        )
+
+    # add many wormholes at once, entries being a list of [name, watchlist, comments]
+    def import_jcodes(self, entries):
+        with self.__lock:
+            wh_added = []
+            errors = []
+            trip_list = []
+
+            # validate every name against Epicenter in one pass
+            names = set([wh.name for wh in self.__whlist])
+            valid_entries = []
+            for [name, watchlist, comments] in entries:
+                name = name.upper()
+                sysId = self.__epi.getSysId(name)
+                if sysId <= 0:
+                    errors.append("{} - not a valid wormhole".format(name))
+                elif name in names:
+                    errors.append("{} - already in the list".format(name))
+                else:
+                    names.add(name)
+                    valid_entries.append([sysId, name, watchlist, comments])
+
+            if valid_entries:
+                for [sysId, name, watchlist, comments] in valid_entries:
+                    [wh, trip_comments] = self.__new_jcode(sysId, name, watchlist, comments)
+                    wh_added.append(wh)
+                    trip_list.append([sysId, trip_comments])
+
+                # database insert in a single transaction
+                statement = "INSERT INTO {} VALUES (?, ?, ?, ?, ?, ?, ?)".format(self.__table_jcodes)
+                self.__cursor.executemany(statement, [self.__jcode_row(wh) for wh in wh_added])
+                self.__whlist.extend(wh_added)
+                for wh in wh_added:
+                    self.views.update_jcode(wh)
+                self.__commit()
+
+                # fetch Zkillboard data concurrently in the background
+                self.__seed_jcodes(wh_added)
+
+                # add tripwire comments using a single connection
                 if BountyConfig.TRIP_INFO["enabled"]:
-                    tripwire_thread = threading.Thread(target=self.tripwire_add_or_update, args=(sysId, trip_comments))
+                    tripwire_thread = threading.Thread(target=self.tripwire_add_or_update_many, args=(trip_list,))
                     tripwire_thread.daemon = True
                     tripwire_thread.start()
 
-                # database insert
-                statement = "INSERT INTO {} VALUES (?, ?, ?, ?, ?, ?, ?)".format(self.__table_jcodes)
-                self.__cursor.execute(
-                    statement,
-                    (sysId, name, creation_date, bb_comments, lastkillId, lastkillDate, 1 if watchlist else 0)
-                )
-                self.__db_con.commit()
-                return str(wh)  # all OK :)
+            return [wh_added, errors]
+
+    # add many generic wormholes at once
+    def import_generics(self, descriptions):
+        with self.__lock:
+            generics_added = []
+            trip_list = []
+            creation_date = time.strftime("%Y-%m-%d")
+
+            # database insert in a single transaction
+            statement = "INSERT INTO {} VALUES (NULL, ?, ?)".format(self.__table_generics)
+            for description in descriptions:
+                [bb_description, trip_description] = self.shortlink(description)
+                self.__cursor.execute(statement, (creation_date, bb_description))
+                idx = self.__cursor.lastrowid
+                [_, jcodes] = self.__epi.computeGeneric(bb_description)
+                generics_added.append(GenericWh(idx, creation_date, bb_description, jcodes))
+                trip_list.append([idx, trip_description, jcodes])
+            self.__generics.extend(generics_added)
+            for generic_wh in generics_added:
+                self.views.update_generic(generic_wh)
+            self.__commit()
+
+            # add tripwire comments using a single connection
+            if BountyConfig.TRIP_INFO["enabled"] and trip_list:
+                tripwire_thread = threading.Thread(target=self.tripwire_add_generic_many, args=(trip_list,))
+                tripwire_thread.daemon = True
+                tripwire_thread.start()
+
+            return generics_added
+
+    # read bounty orders from a CSV (name, watchlist, comments) or JSON file
+    @staticmethod
+    def read_orders(file_name):
+        entries = []
+
+        with open(file_name, "rb") as f:
+            if file_name.lower().endswith(".json"):
+                for item in json.load(f):
+                    comments = item.get("comments")
+                    entries.append([
+                        str(item["name"]),
+                        bool(item.get("watchlist", True)),
+                        unicode(comments if comments is not None else "").encode('ascii', 'ignore')
+                    ])
             else:
-                return "{} - already in the list".format(name)
-        else:
-            return "{} - not a valid wormhole".format(name)
-    
+                for row in csv.reader(f):
+                    if len(row) < 2 or row[0].strip().lower() == "name":
+                        continue  # skip header and incomplete rows
+                    entries.append([
+                        row[0].strip(),
+                        row[1].strip().lower() in ["true", "1", "yes"],
+                        ",".join(row[2:]).strip()
+                    ])
+
+        return entries
+
+    # stream the jcodes table as CSV lines
+    def export_jcodes(self):
+        conn = BountySchema.connect(self.__db_name)
+        try:
+            yield self.__csv_line(["name", "watchlist", "comments"])
+            for row in conn.cursor().execute("SELECT Name, Watchlist, Comments FROM {} ORDER BY Name ASC".format(
+                    self.__table_jcodes)):
+                yield self.__csv_line([row[0], "true" if row[1] > 0 else "false", row[2]])
+        finally:
+            conn.close()
+
+    # stream the generics table as CSV lines
+    def export_generics(self):
+        conn = BountySchema.connect(self.__db_name)
+        try:
+            yield self.__csv_line(["id", "date", "description"])
+            for row in conn.cursor().execute("SELECT Idx, Date, Description FROM {} ORDER BY Idx ASC".format(
+                    self.__table_generics)):
+                yield self.__csv_line(row)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def __csv_line(values):
+        buf = StringIO()
+        csv.writer(buf, lineterminator="").writerow(
+            [value.encode('ascii', 'ignore') if isinstance(value, unicode) else value for value in values]
+        )
+        return buf.getvalue()
+
     # add a new generic wormhole, ex: C3 with HS static
     def add_generic(self, description):
-        creation_date = time.strftime("%Y-%m-%d")
-        [bb_description, trip_description] = self.shortlink(description)
+        with self.__lock:
+            creation_date = time.strftime("%Y-%m-%d")
+            [bb_description, trip_description] = self.shortlink(description)
 
-        # database insert
-        statement = "INSERT INTO {} VALUES (NULL, ?, ?)".format(self.__table_generics)
-        self.__cursor.execute(statement, (creation_date, bb_description))
-        idx = self.__cursor.lastrowid
-        self.__db_con.commit()
+            # database insert
+            statement = "INSERT INTO {} VALUES (NULL, ?, ?)".format(self.__table_generics)
+            self.__cursor.execute(statement, (creation_date, bb_description))
+            idx = self.__cursor.lastrowid
         
-        # list insert
-        [result_info, jcodes] = self.__epi.computeGeneric(bb_description)
-        generic_wh = GenericWh(idx, creation_date, bb_description, jcodes)
-        self.__generics.append(generic_wh)
-
-        # add tripwire comments
-        if BountyConfig.TRIP_INFO["enabled"]:
-            tripwire_thread = threading.Thread(target=self.tripwire_add_generic, args=(idx, trip_description, jcodes))
-            tripwire_thread.daemon = True
-            tripwire_thread.start()
-
-        return [str(generic_wh), result_info]
+            # list insert
+            [result_info, jcodes] = self.__epi.computeGeneric(bb_description)
+            generic_wh = GenericWh(idx, creation_date, bb_description, jcodes)
+            self.__generics.append(generic_wh)
+            self.views.update_generic(generic_wh)
+            self.__commit()
+
+            # add tripwire comments
+            if BountyConfig.TRIP_INFO["enabled"]:
+                tripwire_thread = threading.Thread(
+                    target=self.tripwire_add_generic, args=(idx, trip_description, jcodes)
+                )
+                tripwire_thread.daemon = True
+                tripwire_thread.start()
+
+            return [str(generic_wh), result_info]
     
     # remove wormhole (if exists)
     def remove_jcode(self, name):
-        name = name.upper()  # ignore case
-        wh = self.get_jcode(name)
+        with self.__lock:
+            name = name.upper()  # ignore case
+            wh = self.get_jcode(name)
 
-        # was it found?
-        if wh != None:
-            sysId = wh.sysId
-            self.__whlist.remove(wh)
+            # was it found?
+            if wh != None:
+                sysId = wh.sysId
+                self.__whlist.remove(wh)
+                self.views.remove_jcode(name)
             
-            # database remove
-            statement = "DELETE FROM {} WHERE Name=?".format(self.__table_jcodes)
-            self.__cursor.execute(statement, (name,))
-            self.__db_con.commit()
+                # database remove
+                statement = "DELETE FROM {} WHERE Name=?".format(self.__table_jcodes)
+                self.__cursor.execute(statement, (name,))
+                self.__stats.remove(sysId)
+                statement = "DELETE FROM {} WHERE SysId=?".format(self.__table_stats)
+                self.__cursor.execute(statement, (sysId,))
+                self.__commit()
 
-            # delete tripwire comments
-            if BountyConfig.TRIP_INFO["enabled"]:
-                tripwire_thread = threading.Thread(target=self.tripwire_delete, args=(sysId,))
-                tripwire_thread.daemon = True
-                tripwire_thread.start()
+                # delete tripwire comments
+                if BountyConfig.TRIP_INFO["enabled"]:
+                    tripwire_thread = threading.Thread(target=self.tripwire_delete, args=(sysId,))
+                    tripwire_thread.daemon = True
+                    tripwire_thread.start()
             
-            return "Wormhole {} removed".format(name)
-        else:
-            return "Wormhole {} is not in the list".format(name)
+                return "Wormhole {} removed".format(name)
+            else:
+                return "Wormhole {} is not in the list".format(name)
     
     # remove generic wormhole by Idx (if exists)
     def remove_generic(self, idx):
-        for generic_wh in self.__generics:
-            if generic_wh.idx == idx:
-                self.__generics.remove(generic_wh)
+        with self.__lock:
+            for generic_wh in self.__generics:
+                if generic_wh.idx == idx:
+                    self.__generics.remove(generic_wh)
+                    self.views.remove_generic(idx)
                 
-                # database remove
-                statement = "DELETE FROM {} WHERE Idx=?".format(self.__table_generics)
-                self.__cursor.execute(statement, (idx, ))
-                self.__db_con.commit()
+                    # database remove
+                    statement = "DELETE FROM {} WHERE Idx=?".format(self.__table_generics)
+                    self.__cursor.execute(statement, (idx, ))
+                    self.__commit()
 
-                # delete tripwire comments
-                if BountyConfig.TRIP_INFO["enabled"]:
-                    tripwire_thread = threading.Thread(
-                        target=self.tripwire_delete_generic,
-                        args=(idx, generic_wh.jcodes)
-                    )
-                    tripwire_thread.daemon = True
-                    tripwire_thread.start()
+                    # delete tripwire comments
+                    if BountyConfig.TRIP_INFO["enabled"]:
+                        tripwire_thread = threading.Thread(
+                            target=self.tripwire_delete_generic,
+                            args=(idx, generic_wh.jcodes)
+                        )
+                        tripwire_thread.daemon = True
+                        tripwire_thread.start()
                 
-                return "Generic wormhole Id#{} removed".format(idx)
+                    return "Generic wormhole Id#{} removed".format(idx)
         
-        return "Generic wormhole Id#{} is not in the list".format(idx)
+            return "Generic wormhole Id#{} is not in the list".format(idx)
     
     # edit the comments of a specific wormhole
     def edit_jcode(self, name, watchlist, comments):
-        name = name.upper()  # ignore case
+        with self.__lock:
+            name = name.upper()  # ignore case
         
-        for index, wh in enumerate(self.__whlist):
-            if wh.name == name:
-                wh.watchlist = watchlist
+            for index, wh in enumerate(self.__whlist):
+                if wh.name == name:
+                    wh.watchlist = watchlist
 
-                # only update comments if input string is not empty
-                if len(comments) > 0:
-                    [bb_comments, trip_comments] = self.shortlink(comments)
-                    wh.comments = bb_comments
-                    statement = "UPDATE {} SET Watchlist=?, Comments=? WHERE Name=?".format(self.__table_jcodes)
-                    self.__cursor.execute(statement, (1 if watchlist else 0, bb_comments, name))
+                    # only update comments if input string is not empty
+                    if len(comments) > 0:
+                        [bb_comments, trip_comments] = self.shortlink(comments)
+                        wh.comments = bb_comments
+                        statement = "UPDATE {} SET Watchlist=?, Comments=? WHERE Name=?".format(self.__table_jcodes)
+                        self.__cursor.execute(statement, (1 if watchlist else 0, bb_comments, name))
 
-                    # edit tripwire comments
-                    if BountyConfig.TRIP_INFO["enabled"]:
-                        tripwire_thread = threading.Thread(
-                            target=self.tripwire_add_or_update,
-                            args=(wh.sysId, trip_comments)
-                        )
-                        tripwire_thread.daemon = True
-                        tripwire_thread.start()
-                else:
-                    statement = "UPDATE {} SET Watchlist=? WHERE Name=?".format(self.__table_jcodes)
-                    self.__cursor.execute(statement, (1 if watchlist else 0, name))
+                        # edit tripwire comments
+                        if BountyConfig.TRIP_INFO["enabled"]:
+                            tripwire_thread = threading.Thread(
+                                target=self.tripwire_add_or_update,
+                                args=(wh.sysId, trip_comments)
+                            )
+                            tripwire_thread.daemon = True
+                            tripwire_thread.start()
+                    else:
+                        statement = "UPDATE {} SET Watchlist=? WHERE Name=?".format(self.__table_jcodes)
+                        self.__cursor.execute(statement, (1 if watchlist else 0, name))
 
-                self.__whlist[index] = wh
-                self.__db_con.commit()
-                return str(wh)
+                    self.__whlist[index] = wh
+                    self.views.update_jcode(wh)
+                    self.__commit()
+                    return str(wh)
 
-        return "Wormhole {} is not in the list".format(name)
+            return "Wormhole {} is not in the list".format(name)
     
     # edit the description of a generic wormhole
     def edit_generic(self, idx, description):
-        for index, generic_wh in enumerate(self.__generics):
-            if generic_wh.idx == idx:
-                [bb_description, trip_description] = self.shortlink(description)
-                [result_info, jcodes] = self.__epi.computeGeneric(bb_description)
-                generic_wh.description = bb_description
-                old_jcodes = list(generic_wh.jcodes)
-                generic_wh.jcodes = jcodes
-                self.__generics[index] = generic_wh
+        with self.__lock:
+            for index, generic_wh in enumerate(self.__generics):
+                if generic_wh.idx == idx:
+                    [bb_description, trip_description] = self.shortlink(description)
+                    [result_info, jcodes] = self.__epi.computeGeneric(bb_description)
+                    generic_wh.description = bb_description
+                    old_jcodes = list(generic_wh.jcodes)
+                    generic_wh.jcodes = jcodes
+                    self.__generics[index] = generic_wh
+                    self.views.update_generic(generic_wh)
         
-                # database modify
-                statement = "UPDATE {} SET Description=? WHERE Idx=?".format(self.__table_generics)
-                self.__cursor.execute(statement, (bb_description, idx))
-                self.__db_con.commit()
+                    # database modify
+                    statement = "UPDATE {} SET Description=? WHERE Idx=?".format(self.__table_generics)
+                    self.__cursor.execute(statement, (bb_description, idx))
+                    self.__commit()
 
-                # edit tripwire comments
-                if BountyConfig.TRIP_INFO["enabled"]:
-                    tripwire_thread = threading.Thread(
-                        target=self.tripwire_update_generic,
-                        args=(idx, trip_description, old_jcodes, jcodes)
-                    )
-                    tripwire_thread.daemon = True
-                    tripwire_thread.start()
+                    # edit tripwire comments
+                    if BountyConfig.TRIP_INFO["enabled"]:
+                        tripwire_thread = threading.Thread(
+                            target=self.tripwire_update_generic,
+                            args=(idx, trip_description, old_jcodes, jcodes)
+                        )
+                        tripwire_thread.daemon = True
+                        tripwire_thread.start()
                 
-                return [str(generic_wh), result_info]
+                    return [str(generic_wh), result_info]
 
-        return ["Generic #{} is not in the list".format(idx), ""]
+            return ["Generic #{} is not in the list".format(idx), ""]
     
     # returns the list of wormholes in the whlist
     def list_jcode(self):
@@ -424,16 +714,48 @@ class BountyDb():
     
     # wrapper for Epicenter's search function
     def search_generic(self, description):
-        return self.__epi.computeGeneric(description)
+        start = time.time()
+        result = self.__epi.computeGeneric(description)
+        self.__catalog_timing("search").observe(time.time() - start)
+        return result
     
     # wrapper for Epicenter's static code information function
     def search_static(self, static_code):
-        return self.__epi.getStatic(static_code)
+        start = time.time()
+        result = self.__epi.getStatic(static_code)
+        self.__catalog_timing("static").observe(time.time() - start)
+        return result
+
+    # histogram of an Epicenter lookup
+    @staticmethod
+    def __catalog_timing(operation):
+        return metrics.histogram(
+            "bb_catalog_seconds", "Epicenter lookup time [seconds]", {"operation": operation}
+        )
 
     # wrapper for Epicenter's static mass information function
     def static_mass(self, static_code):
         return self.__epi.static_mass(static_code)
+
+    # wrapper for Epicenter's static mass table function
+    def static_masses(self):
+        return self.__epi.static_masses()
+
+    # wrapper for Epicenter's static stable time function
+    def static_lifetime(self, static_code):
+        return self.__epi.static_lifetime(static_code)
     
+    # kill activity rollups of a wormhole in the whlist (None if not present)
+    def stats_jcode(self, name):
+        wh = self.get_jcode(name)
+        if wh is not None:
+            return self.__stats.summary(wh.sysId)
+        return None
+
+    # kill activity rollups of every wormhole in the whlist, as [wh, summary]
+    def stats_all(self):
+        return [[wh, self.__stats.summary(wh.sysId)] for wh in list(self.__whlist)]
+
     # get information on a specific wormhole (if present in whlist)
     def get_jcode(self, name):
         name = name.upper()  # ignore case
@@ -460,165 +782,246 @@ class BountyDb():
     
     # clear the entire jcode list
     def clear_jcode(self):
-        self.__whlist = []
+        with self.__lock:
+            self.__whlist = []
+            self.views.clear_jcodes()
         
-        # database remove all
-        self.__cursor.execute("DELETE FROM {}".format(self.__table_jcodes))
-        self.__db_con.commit()
+            # database remove all
+            self.__stats.clear()
+            self.__cursor.execute("DELETE FROM {}".format(self.__table_jcodes))
+            self.__cursor.execute("DELETE FROM {}".format(self.__table_stats))
+            self.__commit()
 
     # clear the entire generic wormhole list
     def clear_generic(self):
-        self.__generics = []
+        with self.__lock:
+            self.__generics = []
+            self.views.clear_generics()
         
-        # database remove all
-        self.__cursor.execute("DELETE FROM {}".format(self.__table_generics))
-        self.__db_con.commit()
+            # database remove all
+            self.__cursor.execute("DELETE FROM {}".format(self.__table_generics))
+            self.__commit()
 
     # -----------------------------------------------------------------------------
+    # Tripwire connections shared by every bounty database of the process
+    __trip_pool = None
+    __trip_pool_lock = threading.Lock()
+
     @staticmethod
+    def tripwire_pool():
+        with BountyDb.__trip_pool_lock:
+            if BountyDb.__trip_pool is None:
+                BountyDb.__trip_pool = TripwirePool(
+                    lambda: TripwireSql.connect(
+                        user=BountyConfig.TRIP_INFO["user"],
+                        passwd=BountyConfig.TRIP_INFO["pass"],
+                        host=BountyConfig.TRIP_INFO["host"],
+                        port=BountyConfig.TRIP_INFO["port"],
+                        db=BountyConfig.TRIP_INFO["db"]
+                    ),
+                    BountyConfig.TRIP_INFO.get("pool_size", 4),
+                    BountyConfig.TRIP_INFO.get("pool_wait", 30),
+                    BountyConfig.TRIP_INFO.get("ping_after", 60)
+                )
+            return BountyDb.__trip_pool
+
+    # Tripwire comments on a pooled connection, committed when the block succeeds
+    @staticmethod
+    @contextmanager
     def tripwire_connect():
-        return TripwireSql(
-            user=BountyConfig.TRIP_INFO["user"],
-            passwd=BountyConfig.TRIP_INFO["pass"],
-            mask=BountyConfig.TRIP_INFO["mask"],
-            trip_char_id=BountyConfig.TRIP_INFO["trip_char_id"],
-            host=BountyConfig.TRIP_INFO["host"],
-            port=BountyConfig.TRIP_INFO["port"],
-            db=BountyConfig.TRIP_INFO["db"]
-        )
+        with BountyDb.tripwire_pool().connection() as db_con:
+            yield TripwireSql(
+                user=None,
+                passwd=None,
+                mask=BountyConfig.TRIP_INFO["mask"],
+                trip_char_id=BountyConfig.TRIP_INFO["trip_char_id"],
+                db_con=db_con
+            )
 
     def tripwire_add_or_update(self, sysId, comments):
-        trip_sql = self.tripwire_connect()
-        trip_sql.add_or_update_specific(sysId, comments)
-        trip_sql.close_db()
+        with self.tripwire_connect() as trip_sql:
+            trip_sql.add_or_update_specific(sysId, comments)
+
+    def tripwire_add_or_update_many(self, trip_list):
+        with self.tripwire_connect() as trip_sql:
+            for [sysId, comments] in trip_list:
+                trip_sql.add_or_update_specific(sysId, comments)
 
     def tripwire_delete(self, sysId):
-        trip_sql = self.tripwire_connect()
-        trip_sql.delete_specific(sysId)
-        trip_sql.close_db()
+        with self.tripwire_connect() as trip_sql:
+            trip_sql.delete_specific(sysId)
 
     def tripwire_add_generic(self, generic_id, description, jcodes):
         system_ids = [self.__epi.getSysId(name) for name in jcodes]
-        trip_sql = self.tripwire_connect()
-        trip_sql.add_generic(generic_id, description, system_ids)
-        trip_sql.close_db()
+        with self.tripwire_connect() as trip_sql:
+            trip_sql.add_generic(generic_id, description, system_ids)
+
+    def tripwire_add_generic_many(self, trip_list):
+        with self.tripwire_connect() as trip_sql:
+            for [generic_id, description, jcodes] in trip_list:
+                system_ids = [self.__epi.getSysId(name) for name in jcodes]
+                trip_sql.add_generic(generic_id, description, system_ids)
 
     def tripwire_update_generic(self, generic_id, description, old_jcodes, new_jcodes):
-        old_system_ids = [self.__epi.getSysId(name) for name in old_jcodes]
+        old_system_ids = set([self.__epi.getSysId(name) for name in old_jcodes])
         new_system_ids = [self.__epi.getSysId(name) for name in new_jcodes]
-        trip_sql = self.tripwire_connect()
-        trip_sql.delete_generic(generic_id, old_system_ids)
-        trip_sql.add_generic(generic_id, description, new_system_ids)
-        trip_sql.close_db()
+        left_system_ids = list(old_system_ids - set(new_system_ids))
+        with self.tripwire_connect() as trip_sql:
+            # systems which stayed are only rewritten if the description changed, the ones which joined get it added
+            trip_sql.delete_generic(generic_id, left_system_ids)
+            trip_sql.add_generic(generic_id, description, new_system_ids)
 
     def tripwire_delete_generic(self, generic_id, jcodes):
         system_ids = [self.__epi.getSysId(name) for name in jcodes]
-        trip_sql = self.tripwire_connect()
-        trip_sql.delete_generic(generic_id, system_ids)
-        trip_sql.close_db()
+        with self.tripwire_connect() as trip_sql:
+            trip_sql.delete_generic(generic_id, system_ids)
     # -----------------------------------------------------------------------------
 
     # sqlite db can not be updated from 2 different threads
-    def __update_sqlite(self, db_name, table_name, lastkillId, lastkillDate, wh_name):
-        conn = lite.connect(db_name)
+    def __update_sqlite(self, db_name, table_name, updates):
+        conn = BountySchema.connect(db_name)
         c = conn.cursor()
-        statement = "UPDATE {} SET LastkillId=?, LastkillDate=? WHERE Name=?".format(table_name)
-        c.execute(statement, (lastkillId, lastkillDate, wh_name))
+        statement = "UPDATE {} SET LastkillId=?, LastkillTime=? WHERE Name=?".format(table_name)
+        c.executemany(statement, [  # list of [lastkillId, lastkillDate, wh_name]
+            (lastkillId, BbCommon.epoch(lastkillDate), wh_name) for [lastkillId, lastkillDate, wh_name] in updates
+        ])
+        conn.commit()
+        conn.close()
+
+    # persist the activity rollups of a system (called from the checking thread)
+    def __update_stats(self, db_name, table_name, sysId):
+        conn = BountySchema.connect(db_name)
+        c = conn.cursor()
+        statement = "INSERT OR REPLACE INTO {} VALUES (?, ?)".format(table_name)
+        c.execute(statement, (sysId, self.__stats.snapshot(sysId)))
         conn.commit()
         conn.close()
         
+    # wormholes of the mass tracker, as [channel, signature, state] (state is a JSON string)
+    def load_masstracker(self):
+        with self.__lock:
+            statement = "SELECT Channel, Signature, State FROM {}".format(self.__table_masstracker)
+            return [list(row) for row in self.__cursor.execute(statement)]
+
+    # persist mass tracker changes in a single transaction (called from the write-behind thread)
+    def save_masstracker(self, updates, removals):
+        conn = BountySchema.connect(self.__db_name)
+        c = conn.cursor()
+        c.executemany(
+            "INSERT OR REPLACE INTO {} VALUES (?, ?, ?)".format(self.__table_masstracker),
+            [(channel, signature, state) for [channel, signature, state] in updates]
+        )
+        c.executemany(
+            "DELETE FROM {} WHERE Channel=? AND Signature=?".format(self.__table_masstracker),
+            [(channel, signature) for [channel, signature] in removals]
+        )
+        conn.commit()
+        conn.close()
+
+    # recent Thera report sets, by kind
+    def __thera_sets(self):
+        return [
+            ["specific", self.__thera_recent],
+            ["generic", self.__thera_generic],
+            ["tripnull", self.__thera_tripnull]
+        ]
+
+    # persist the recent Thera reports (called from the checking thread)
+    def __update_thera(self, db_name, table_name):
+        conn = BountySchema.connect(db_name)
+        c = conn.cursor()
+        c.execute("DELETE FROM {}".format(table_name))
+        statement = "INSERT INTO {} VALUES (?, ?, ?)".format(table_name)
+        for kind, thera_set in self.__thera_sets():
+            c.executemany(statement, [(kind, name, int(expiry)) for name, expiry in thera_set.snapshot()])
+        conn.commit()
+        conn.close()
+
     # update wormhole list for thread safety purposes
     def __update_whlist(self, lastkillId, lastkillDate, wh_name):
-        for index, wh in enumerate(self.__whlist):
-            # is the wormhole still in the list?
-            if wh_name == wh.name:
-                wh.lastkillId = lastkillId
-                wh.lastkillDate = lastkillDate
-                self.__whlist[index] = wh
-    
-    # thread start helper function
-    def __start_check(self):
-        bounty_thread = threading.Timer(1, self.__check, ())
-        bounty_thread.setDaemon(True)
-        bounty_thread.start()
+        with self.__lock:
+            for index, wh in enumerate(self.__whlist):
+                # is the wormhole still in the list?
+                if wh_name == wh.name:
+                    wh.lastkillId = lastkillId
+                    wh.lastkillDate = lastkillDate
+                    self.__whlist[index] = wh
+                    self.views.update_jcode(wh)
+                    self.__bump_version()
     
-    # check for every system if the last killId is different from the stored killId
-    def __check(self):
-        print "[{}] Checking cycle {}...".format(time.strftime("%Y-%m-%d %H:%M:%S"), str(self.__cycle + 1))
-        threading.Timer(self.__interval, self.__check, ()).start()
-        check_counter = 0
-
-        # populate list with wormhole connections from Thera (if enabled)
-        if BountyConfig.THERA:
-            thera_systems = EveScout.thera_connections()
-            print "Retrieving Thera connections: {}".format(thera_systems)
-        else:
-            thera_systems = []
-
-        # delete old Thera specific reports
-        for key, value in self.__thera_recent.items():
-            if int(time.time()) - value > BountyConfig.THERA_HOURS * 3600:
-                del self.__thera_recent[key]
+    # -----------------------------------------------------------------------------
+    # KillPoller subscriber
 
-        # delete old Thera generic reports
-        for key, value in self.__thera_generic.items():
-            if int(time.time()) - value > BountyConfig.THERA_HOURS * 3600:
-                del self.__thera_generic[key]
+    # systems to be checked on Zkillboard in this cycle
+    def polled_systems(self):
+        # systems waiting for their Zkillboard seed have no reference kill yet
+        self.__polled = dict([[wh.sysId, wh] for wh in list(self.__whlist) if wh.watchlist and not wh.pending()])
+        return self.__polled.keys()
 
-        # delete old Thera tripnull reports
-        for key, value in self.__thera_tripnull.items():
-            if int(time.time()) - value > BountyConfig.THERA_HOURS * 3600:
-                del self.__thera_tripnull[key]
+    # report the systems of the orders which are connected to Thera
+    def poll_thera(self, thera_systems):
+        # delete old Thera reports
+        thera_changed = False
+        for _, thera_set in self.__thera_sets():
+            if thera_set.expire() > 0:
+                thera_changed = True
 
         # check Thera generics
         for th_sys in thera_systems:
             for generic_wh in list(self.__generics):
-                if th_sys in generic_wh.jcodes and th_sys not in self.__thera_generic.keys():
-                    self.__thera_generic[th_sys] = int(time.time())
+                if th_sys in generic_wh.jcodes and th_sys not in self.__thera_generic:
+                    self.__thera_generic.add(th_sys)
+                    thera_changed = True
                     self.__report_thera_generic(generic_wh, th_sys)
+                    metrics.counter("bb_thera_reports_total", "Thera connection reports", {"kind": "generic"}).inc()
 
         # check Thera tripnulls
         for th_sys in thera_systems:
             match_obj = re.search("J000[0-9]{3}", th_sys)
-            if match_obj and th_sys not in self.__thera_tripnull.keys():
-                self.__thera_tripnull[th_sys] = int(time.time())
+            if match_obj and th_sys not in self.__thera_tripnull:
+                self.__thera_tripnull.add(th_sys)
+                thera_changed = True
                 self.__report_thera_tripnull(th_sys)
+                metrics.counter("bb_thera_reports_total", "Thera connection reports", {"kind": "tripnull"}).inc()
 
-        # make new list for thread safety reasons and check that list
+        # check Thera specifics
         for wh in list(self.__whlist):
-            # only check watchlisted wormholes
-            if wh.watchlist:
-
-                # check for Thera connections
-                if wh.name in thera_systems:
-                    if wh.name not in self.__thera_recent.keys():
-                        self.__thera_recent[wh.name] = int(time.time())
-                        self.__report_thera(wh)
-
-                # fetch Zkillboard data and check if anything was received
-                time.sleep(self.__apiwait)
-                zkbInfo = Zkb.lastkill(wh.sysId, self.__cycle + 1)
-                
-                if zkbInfo != None:
-                    check_counter += 1
-                    [lastkillId, lastkillDate] = zkbInfo                    
-                    if int(lastkillId) > int(wh.lastkillId):
-                        # update wormhole list and database (if it wasn't removed from watchlist in the meantime)
-                        self.__update_whlist(lastkillId, lastkillDate, wh.name)
-                        self.__update_sqlite(self.__db_name, self.__table_jcodes, lastkillId, lastkillDate, wh.name)
-                        
-                        # finally, report kill, hurray! :)
-                        print "[Report] {} - Kill detected at {}, Id: {}".format(wh.name, lastkillDate, lastkillId)
-                        self.__report_kill(wh)
-                else:
-                    print "[Error] Zkillboard API call failed"
-        
-        print "[Info] Cycle ended - {} wormholes were checked".format(check_counter)
-        
-        # super ugly hack for limit cycling (to bypass mean zkb caching) >:)
-        self.__cycle += 1
-        if self.__cycle >= self.__cyclelimit:
-            self.__cycle = 0
+            if wh.watchlist and wh.name in thera_systems and wh.name not in self.__thera_recent:
+                self.__thera_recent.add(wh.name)
+                thera_changed = True
+                self.__stats.record_thera(wh.sysId)
+                self.__update_stats(self.__db_name, self.__table_stats, wh.sysId)
+                self.__report_thera(wh)
+                metrics.counter("bb_thera_reports_total", "Thera connection reports", {"kind": "specific"}).inc()
+
+        if thera_changed:
+            self.__update_thera(self.__db_name, self.__table_thera)
+
+    # check if the last killId of a polled system is different from the stored killId
+    def poll_kill(self, sysId, zkbInfo):
+        wh = self.__polled.get(sysId)
+        if wh is None:
+            return
+
+        [lastkillId, lastkillDate] = zkbInfo
+        if lastkillId > wh.lastkillId:
+            # update wormhole list and database (if it wasn't removed from watchlist in the meantime)
+            self.__update_whlist(lastkillId, lastkillDate, wh.name)
+            self.__update_sqlite(self.__db_name, self.__table_jcodes, [[lastkillId, lastkillDate, wh.name]])
+            # only the latest kill is known: the stats count the checks with a new kill, not every kill
+            self.__stats.record_kill(wh.sysId, BbCommon.epoch(lastkillDate))
+            self.__update_stats(self.__db_name, self.__table_stats, wh.sysId)
+
+            # finally, report kill, hurray! :)
+            print "[Report] {} - Kill detected at {}, Id: {}".format(wh.name, lastkillDate, lastkillId)
+            self.__report_kill(wh)
+            metrics.counter("bb_kills_detected_total", "Kills reported in bounty systems").inc()
+            kill_time = BbCommon.epoch(lastkillDate)
+            if kill_time > 0:
+                metrics.histogram(
+                    "bb_detection_lag_seconds", "Time from a kill to its report [seconds]",
+                    bounds=[60, 300, 600, 1200, 1800, 3600, 7200, 21600, 86400]
+                ).observe(time.time() - kill_time)
 
 def print2screen(msg):
     print "[Report]: ", msg
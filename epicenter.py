@@ -5,8 +5,10 @@ Created on 2015-05-30
 """
 
 import re
+import time
 import sqlite3 as lite
 from bb_common import BbCommon
+from bb_metrics import metrics
 
 
 class Epistatic:
@@ -221,12 +223,14 @@ class Epicenter:
     
     # constructor
     def __init__(self, db_name, table_wh, table_statics):
-        
+        load_start = time.time()
         self.db_name = db_name               # epicenter database name
         self.table_wh = table_wh             # table name where info on wormholes is stored
         self.table_statics = table_statics   # table name where info on static codes is stored
         self.__epistatics = []               # ram mirror of statics table
+        self.__epistaticdict = {}            # statics table indexed by code
         self.__epiwhlist = []                # ram mirror of wormhole table
+        self.__epiwhdict = {}                # wormhole table indexed by name
         
         # database connection
         self.db_con = lite.connect(self.db_name)
@@ -240,6 +244,7 @@ class Epicenter:
         for row in result:
             epix = Epistatic(row[0], row[1], int(row[2]), int(row[3]), int(row[4]), row[5])
             self.__epistatics.append(epix)
+            self.__epistaticdict[epix.static_code] = epix
         
         # -----------------------------------------------------------------------------
         # load wormhole data
@@ -269,64 +274,65 @@ class Epicenter:
                         pass
             
             self.__epiwhlist.append(epiwh)
+            self.__epiwhdict[epiwh.name] = epiwh
             # print epiwh
         
         # database connection not needed anymore
         self.__closeDb()
+        metrics.gauge("bb_catalog_load_seconds", "Time to load the Epicenter catalog [seconds]").set(
+            time.time() - load_start
+        )
+        metrics.gauge("bb_catalog_systems", "Wormhole systems in the Epicenter catalog").set(len(self.__epiwhlist))
 
     # Get the internal system Id of the wormhole
     def getSysId(self, name):
-        try:
-            sysId = next(epiwh for epiwh in self.__epiwhlist if epiwh.name == name).sysId
-        except StopIteration:
-            sysId = 0
-        
-        return sysId
+        epiwh = self.__epiwhdict.get(name)
+        return epiwh.sysId if epiwh is not None else 0
     
     # Get the class of the wormhole
     def getClass(self, name):
-        try:
-            wh_class = next(epiwh for epiwh in self.__epiwhlist if epiwh.name == name).wh_class
-        except StopIteration:
-            wh_class = 0
-        
-        return wh_class
+        epiwh = self.__epiwhdict.get(name)
+        return epiwh.wh_class if epiwh is not None else 0
     
     # Get information about a static code
     def getStatic(self, static_code):
         static_code = static_code.upper()
-        for epistatic in self.__epistatics:
-            if static_code == epistatic.static_code:
-                return str(epistatic)
+        epistatic = self.__epistaticdict.get(static_code)
+        if epistatic is not None:
+            return str(epistatic)
             
         return "Code '{}' not found in database".format(static_code)
 
     # Get mass of a static code
     def static_mass(self, static_code):
-        static_code = static_code.upper()
-        for epistatic in self.__epistatics:
-            if static_code == epistatic.static_code:
-                return [float(epistatic.maxmass), float(epistatic.maxjump)]
+        epistatic = self.__epistaticdict.get(static_code.upper())
+        if epistatic is not None:
+            return [float(epistatic.maxmass), float(epistatic.maxjump)]
 
         return [0, 0]
+
+    # Get mass of every static code, as [code, maxmass, maxjump]
+    def static_masses(self):
+        return [
+            [epistatic.static_code, float(epistatic.maxmass), float(epistatic.maxjump)]
+            for epistatic in self.__epistatics
+        ]
+
+    # Get stable time (hours) of a static code
+    def static_lifetime(self, static_code):
+        epistatic = self.__epistaticdict.get(static_code.upper())
+        return epistatic.stabletime if epistatic is not None else 0
     
     # Find out the target system of the static code
     def convertStatic(self, static_code):
-        try:
-            target_sys = next(
-                epistatic for epistatic in self.__epistatics if epistatic.static_code == static_code
-            ).wh_class
-        except StopIteration:
-            target_sys = "Unk"
+        epistatic = self.__epistaticdict.get(static_code)
+        target_sys = epistatic.wh_class if epistatic is not None else "Unk"
         
         return target_sys
 
     # Retrieve overall information on a wormhole
     def info(self, name):
-        try:
-            epiwh = next(epiwh for epiwh in self.__epiwhlist if epiwh.name == name)
-        except StopIteration:
-            epiwh = None
+        epiwh = self.__epiwhdict.get(name)
             
         if epiwh is not None:
             output_info = str(epiwh)
@@ -337,10 +343,7 @@ class Epicenter:
     
     # Retrieve planet information on a wormhole
     def planets(self, name, display_compact=False):
-        try:
-            epiwh = next(epiwh for epiwh in self.__epiwhlist if epiwh.name == name)
-        except StopIteration:
-            epiwh = None
+        epiwh = self.__epiwhdict.get(name)
             
         if epiwh is not None:
             if display_compact:
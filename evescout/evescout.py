@@ -19,6 +19,7 @@ class EveScout:
     def __init__(self):
         pass
 
+    # Wormhole systems connected to Thera (None if the request failed)
     @staticmethod
     def thera_connections():
         wh_systems = []
@@ -33,6 +34,7 @@ class EveScout:
             response = urllib2.urlopen(request)
         except urllib2.URLError as e:
             print "[Error]", e.reason
+            return None
         else:
             if response.info().get("Content-Encoding") == "gzip":
                 buf = StringIO(response.read())
@@ -46,6 +48,7 @@ class EveScout:
                 parsed_json = json.loads(data)
             except ValueError as e:
                 print "[Error]", e
+                return None
             else:
                 if len(parsed_json) > 0:
                     for item in parsed_json:
@@ -0,0 +1,119 @@
+import bisect
+
+from wormholecrit import WormholeCrit
+
+
+class ChanceTable:
+    """
+    Collapse and shrink chances of freshly reported wormholes of every static code and state,
+    computed once over a grid of ship masses and interpolated in between
+    """
+
+    STATES = [WormholeCrit.NEW, WormholeCrit.STABLE, WormholeCrit.DESTAB, WormholeCrit.CRIT]
+
+    # state -> fraction of the nominal mass below which the wormhole shrinks
+    SHRINK_AT = {
+        WormholeCrit.NEW: 0.5,
+        WormholeCrit.STABLE: 0.5,
+        WormholeCrit.DESTAB: 0.1,
+        WormholeCrit.CRIT: 0.0,
+    }
+
+    def __init__(self, statics, hulls):
+        """
+        :param statics: List of [code, maxmass, maxjump]
+        :param hulls: Ship masses [kT] of the grid, the maxjump of every code is added to them
+        """
+        self.__codes = {}  # code -> (maxmass, maxjump)
+        self.__rows = {}   # (maxmass, maxjump, state) -> [envelope, collapse chances, shrink chances]
+
+        for [code, maxmass, maxjump] in statics:
+            if maxmass > 0 and maxjump > 0:
+                self.__codes[code.upper()] = (maxmass, maxjump)
+
+        self.hulls = sorted(set(
+            [float(hull) for hull in hulls if hull > 0] + [maxjump for (_, maxjump) in self.__codes.values()]
+        ))
+        for (maxmass, maxjump) in set(self.__codes.values()):
+            for state in ChanceTable.STATES:
+                self.__rows[(maxmass, maxjump, state)] = ChanceTable.__row(maxmass, maxjump, state, self.hulls)
+
+    def __len__(self):
+        return len(self.__rows)
+
+    @staticmethod
+    def __row(maxmass, maxjump, state, hulls):
+        # envelope and chances of a wormhole type in a state, at every ship mass of the grid
+        wh = WormholeCrit(maxmass, maxjump, state)
+        [lo, hi] = wh.mass
+        threshold = ChanceTable.SHRINK_AT[state] * maxmass
+
+        collapse = []
+        shrink = []
+        for hull in hulls:
+            collapse.append(wh.collapse_chance(hull)[1])
+
+            # remaining mass uniform within the envelope: shrinks if hull < remaining <= threshold + hull
+            shrunk = min(hi, threshold + hull) - max(lo, hull)
+            shrink.append(max(0.0, shrunk) / (hi - lo) * 100.0 if hi > lo else 0.0)
+
+        return [(lo, hi), collapse, shrink]
+
+    def static(self, code):
+        """
+        :return: (maxmass, maxjump) of a static code, None if unknown
+        """
+        return self.__codes.get(code.upper())
+
+    def envelope(self, code, state):
+        """
+        :return: (lower, upper) mass of a static code reported in a state, None if unknown
+        """
+        row = self.__lookup(code, state)
+        return row[0] if row is not None else None
+
+    def rows(self, code, state):
+        """
+        :return: List of [ship mass, collapse chance, shrink chance] of the ships able to jump, None if unknown
+        """
+        row = self.__lookup(code, state)
+        if row is None:
+            return None
+
+        maxjump = self.__codes[code.upper()][1]
+        return [[hull, collapse, shrink] for hull, collapse, shrink in zip(self.hulls, row[1], row[2])
+                if hull <= maxjump]
+
+    def chance(self, code, state, ship_mass):
+        """
+        Interpolate the chances of a ship mass between the closest masses of the grid
+        :return: [plausible, collapse chance, shrink chance], None if the code or state is unknown
+        """
+        row = self.__lookup(code, state)
+        if row is None:
+            return None
+
+        maxjump = self.__codes[code.upper()][1]
+        if not 0 < ship_mass <= maxjump:
+            return [False, 0, 0]
+
+        idx = bisect.bisect_left(self.hulls, ship_mass)
+        if idx == 0:
+            # below the grid: chances grow linearly from a massless ship
+            [lower, upper] = [[0.0, 0.0, 0.0], [self.hulls[0], row[1][0], row[2][0]]]
+        else:
+            lower = [self.hulls[idx - 1], row[1][idx - 1], row[2][idx - 1]]
+            upper = [self.hulls[idx], row[1][idx], row[2][idx]]
+
+        ratio = (ship_mass - lower[0]) / (upper[0] - lower[0])
+        return [
+            True,
+            lower[1] + (upper[1] - lower[1]) * ratio,
+            lower[2] + (upper[2] - lower[2]) * ratio
+        ]
+
+    def __lookup(self, code, state):
+        static = self.__codes.get(code.upper())
+        if static is None:
+            return None
+        return self.__rows.get((static[0], static[1], state))
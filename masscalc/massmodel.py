@@ -0,0 +1,162 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class MassDistribution:
+    """
+    Remaining mass of a wormhole as a discrete distribution: a grid of cells over the total mass
+    (nominal mass +/-10%) and the fraction of it left at spawn time, each cell carrying a weight.
+    Splashes shift the remaining mass of every cell, state observations zero out the cells which contradict them.
+    """
+
+    STEPS = 41  # grid points along the total mass and along the remaining fraction
+
+    # wormhole states, same values as WormholeCrit
+    NEW = 4
+    STABLE = 3
+    DESTAB = 2
+    CRIT = 1
+    COLLAPSED = 0
+
+    # state -> (lower, upper] fraction of the total mass left
+    FRACTIONS = {
+        NEW: (1.0, 1.0),
+        STABLE: (0.5, 1.0),
+        DESTAB: (0.1, 0.5),
+        CRIT: (0.0, 0.1),
+    }
+
+    def __init__(self, wh_mass, wh_state, steps=STEPS):
+        """
+        :param wh_mass: Nominal mass of the wormhole type [kT]
+        :param wh_state: State of the wormhole when spawned (NEW, STABLE, DESTAB or CRIT)
+        :param steps: Grid points along each axis
+        """
+        if np is None:
+            raise ImportError("NumPy is required by the mass distribution model")
+
+        self.wh_mass = wh_mass
+        self.wh_state = wh_state
+        self.steps = steps
+        self.observations = []  # [kind, value] applied since spawn, for persistence
+
+        totals = np.linspace(0.9 * wh_mass, 1.1 * wh_mass, steps)
+        [lo, hi] = MassDistribution.FRACTIONS[wh_state]
+        if lo == hi:
+            fractions = np.array([hi])
+        else:
+            fractions = lo + (hi - lo) * (np.arange(steps) + 0.5) / steps  # cell midpoints
+
+        self.total = np.repeat(totals[:, np.newaxis], len(fractions), axis=1)
+        self.remaining = np.outer(totals, fractions)
+        self.weight = np.full(self.total.shape, 1.0 / self.total.size)
+
+    @staticmethod
+    def available():
+        return np is not None
+
+    def to_dict(self):
+        """
+        State of the model, for persistence: the model is rebuilt by replaying its observations
+        :return: Dictionary of plain values (JSON serializable)
+        """
+        return {
+            "wh_mass": self.wh_mass,
+            "wh_state": self.wh_state,
+            "steps": self.steps,
+            "observations": self.observations
+        }
+
+    @staticmethod
+    def from_dict(state):
+        """
+        Rebuild a model saved with to_dict()
+        :param state: Dictionary returned by to_dict()
+        :return: MassDistribution
+        """
+        model = MassDistribution(state["wh_mass"], state["wh_state"], state["steps"])
+        for [kind, value] in state["observations"]:
+            if kind == "splash":
+                model.splash(value)
+            elif kind == "state":
+                model.observe_state(value)
+        return model
+
+    @staticmethod
+    def states(remaining, total):
+        """
+        :return: Array of the state (STABLE, DESTAB, CRIT or COLLAPSED) of every cell
+        """
+        fraction = remaining / total
+        return np.where(fraction > 0.5, MassDistribution.STABLE,
+                        np.where(fraction > 0.1, MassDistribution.DESTAB,
+                                 np.where(fraction > 0, MassDistribution.CRIT, MassDistribution.COLLAPSED)))
+
+    def splash(self, ship_mass):
+        """
+        A ship went through and the wormhole did not collapse
+        :param ship_mass: Mass of the ship [kT]
+        """
+        self.remaining = self.remaining - ship_mass
+        self.__condition(self.remaining > 0)
+        self.observations.append(["splash", ship_mass])
+
+    def observe_state(self, wh_state):
+        """
+        The wormhole is seen in a given state
+        :param wh_state: WormholeCrit state
+        :return: False if the observation contradicts every cell (the observation is ignored then)
+        """
+        if wh_state == MassDistribution.COLLAPSED:
+            return True
+        if wh_state == MassDistribution.NEW:
+            wh_state = MassDistribution.STABLE
+
+        consistent = self.__condition(MassDistribution.states(self.remaining, self.total) == wh_state)
+        self.observations.append(["state", wh_state])
+        return consistent
+
+    def __condition(self, mask):
+        # keep the weight of the cells where mask holds, unless none of them has any
+        weight = np.where(mask, self.weight, 0.0)
+        norm = weight.sum()
+        if norm <= 0:
+            return False
+        self.weight = weight / norm
+        return True
+
+    def collapse_chance(self, ship_mass):
+        """
+        :return: Probability [%] that a ship of the given mass collapses the wormhole
+        """
+        return float(self.weight[self.remaining <= ship_mass].sum()) * 100.0
+
+    def shrink_chance(self, ship_mass):
+        """
+        :return: Probability [%] that a ship of the given mass shrinks the wormhole without collapsing it
+        """
+        after = self.remaining - ship_mass
+        shrunk = (after > 0) & \
+            (MassDistribution.states(after, self.total) < MassDistribution.states(self.remaining, self.total))
+        return float(self.weight[shrunk].sum()) * 100.0
+
+    def interval(self, coverage=0.9):
+        """
+        :param coverage: Probability covered by the interval
+        :return: (lower, upper) central interval of the remaining mass [kT]
+        """
+        order = np.argsort(self.remaining, axis=None)
+        masses = self.remaining.ravel()[order]
+        cumulative = np.cumsum(self.weight.ravel()[order])
+        tail = (1.0 - coverage) / 2
+        lower = masses[min(np.searchsorted(cumulative, tail), masses.size - 1)]
+        upper = masses[min(np.searchsorted(cumulative, 1.0 - tail), masses.size - 1)]
+        return (round(float(lower), 1), round(float(upper), 1))
+
+    def mean(self):
+        """
+        :return: Expected remaining mass [kT]
+        """
+        return float((self.weight * self.remaining).sum())
@@ -0,0 +1,111 @@
+import math
+
+
+class RollPlan:
+    """
+    Rolling plan of a wormhole: round trips which can not collapse it, then a last ship going out and back,
+    collapsing it on the way back (so no ship ends up on the other side)
+    """
+
+    RESOLUTION = 10  # dynamic programming steps per kT
+    RISK_TIE = 0.01  # stranding chances this close to the smallest one are as good, the fewest jumps win
+    MAX_TRIPS = 10   # round trips of a risky plan, unless no plan has that few
+
+    def __init__(self, trips, final, remaining):
+        self.trips = trips          # list of [ship mass, number of round trips], heaviest first
+        self.final = final          # mass of the ship collapsing the wormhole on its way back
+        self.before_final = 2 * sum([mass * count for [mass, count] in trips]) + final  # mass before the last jump
+        self.round_trips = sum([count for [_, count] in trips])
+        self.jumps = 2 * self.round_trips + 2
+
+        # chance (0..1) that the wormhole collapses before the last jump, with a ship on the other side
+        [lo, hi] = remaining
+        if self.before_final < lo:
+            self.risk = 0.0
+        elif hi <= lo:
+            self.risk = 1.0
+        else:
+            self.risk = min(1.0, (self.before_final - lo) / (hi - lo))
+
+    def __str__(self):
+        lines = [">`{} kT` round trip x{}".format(mass, count) for [mass, count] in self.trips]
+        lines.append(">`{} kT` out and back, collapsing the wormhole on the way back".format(self.final))
+        return "\n".join(lines)
+
+    @staticmethod
+    def solve(remaining, ships):
+        """
+        Find the rolling plan with the fewest jumps which can not strand a ship; if there is none,
+        the plan with the smallest chance of stranding a ship, within RISK_TIE of it the one with the fewest jumps
+        (of at most MAX_TRIPS round trips)
+        :param remaining: (lower, upper) bounds of the remaining wormhole mass [kT]
+        :param ships: Masses of the available ships [kT], each one may jump any number of times
+        :return: RollPlan, or None if no ship is given
+        """
+        [lo, hi] = remaining
+        masses = sorted(set([float(mass) for mass in ships if mass > 0]), reverse=True)
+        if not masses:
+            return None
+
+        # best[s] = fewest round trips weighing s steps in total (one way), last[s] = ship of the last one
+        units = [max(1, int(round(mass * RollPlan.RESOLUTION))) for mass in masses]
+        limit = max(0, int(math.ceil(hi * RollPlan.RESOLUTION / 2.0))) + units[0]
+        best = [0] + [None] * limit
+        last = [None] * (limit + 1)
+        for total in range(1, limit + 1):
+            for idx, unit in enumerate(units):
+                if unit <= total and best[total - unit] is not None and \
+                        (best[total] is None or best[total - unit] + 1 < best[total]):
+                    best[total] = best[total - unit] + 1
+                    last[total] = idx
+
+        safe_plan = None
+        risky_plans = []
+        for final in masses:
+            # round trips S must satisfy 2 * S + 2 * final >= hi (collapse on the way back)
+            # and 2 * S + final < lo (no collapse before the last jump)
+            first = max(0, int(math.ceil((hi / 2.0 - final) * RollPlan.RESOLUTION)))
+            safe_end = min(limit + 1, int(math.ceil((lo - final) * RollPlan.RESOLUTION / 2.0)))
+
+            candidates = []
+            safe_totals = [total for total in range(first, safe_end) if best[total] is not None]
+            if safe_totals:
+                candidates.append(min(safe_totals, key=lambda total: best[total]))
+
+            # risky plans with this last ship: above the safe round trips, the risk grows with the total,
+            # so only the totals needing fewer round trips than every lighter one are worth a look
+            fewest = None
+            for total in range(max(first, safe_end), limit + 1):
+                if best[total] is not None and (fewest is None or best[total] < fewest):
+                    fewest = best[total]
+                    candidates.append(total)
+
+            for total in candidates:
+                plan = RollPlan(RollPlan.__trips(total, last, masses, units), final, remaining)
+                if plan.before_final + final < hi:
+                    continue  # rounding of the dynamic programming steps
+
+                if plan.risk == 0:
+                    if safe_plan is None or plan.jumps < safe_plan.jumps or \
+                            (plan.jumps == safe_plan.jumps and plan.before_final < safe_plan.before_final):
+                        safe_plan = plan
+                else:
+                    risky_plans.append(plan)
+
+        if safe_plan is not None or not risky_plans:
+            return safe_plan
+
+        max_trips = max(RollPlan.MAX_TRIPS, min([plan.round_trips for plan in risky_plans]))
+        risky_plans = [plan for plan in risky_plans if plan.round_trips <= max_trips]
+        least_risk = min([plan.risk for plan in risky_plans])
+        return min([plan for plan in risky_plans if plan.risk <= least_risk + RollPlan.RISK_TIE],
+                   key=lambda plan: (plan.jumps, plan.risk))
+
+    @staticmethod
+    def __trips(total, last, masses, units):
+        # round trips of the dynamic programming solution for a total, as [mass, count]
+        counts = [0] * len(masses)
+        while total > 0:
+            counts[last[total]] += 1
+            total -= units[last[total]]
+        return [[mass, count] for mass, count in zip(masses, counts) if count > 0]
@@ -4,7 +4,15 @@ Created on 2016-01-22
 @author: Valtyr Farshield
 """
 
+import time
+
+from bountyconfig import BountyConfig
+from bb_outbox import Outbox
 from wormholecrit import WormholeCrit
+from massmodel import MassDistribution
+from whstore import WhStore
+from rollplan import RollPlan
+from chancetable import ChanceTable
 
 
 def represents_float(s):
@@ -22,29 +30,67 @@ def represents_float(s):
 
 class WhManager:
 
+    EOL_HOURS = 4  # lifetime left to a wormhole reported at the end of its life
+
+    # reported state -> WormholeCrit state
+    STATES = {
+        "new": WormholeCrit.NEW,
+        "stable": WormholeCrit.STABLE,
+        "unstable": WormholeCrit.DESTAB,
+        "critical": WormholeCrit.CRIT,
+    }
+
     def __init__(self, bountybot):
-        self.whlist = []
         self.talk = bountybot.talk
         self.invalid_arg = bountybot.invalid_arg
         self.cmd_error = bountybot.cmd_error
         self.bountydb = bountybot.bountydb
 
-    def present_signature(self, channel, signature):
-        for [ch, sig, _] in self.whlist:
-            if ch == channel and sig == signature:
-                return True
+        # spawned wormholes by (channel, signature), saved in the bounties database in the background
+        self.store = WhStore(
+            self.bountydb.load_masstracker(),
+            self.bountydb.save_masstracker,
+            BountyConfig.MASS_TRACKER_FLUSH,
+            BountyConfig.MASS_TRACKER_TICK
+        )
+        self.expired = 0  # number of wormholes removed at the end of their lifetime
 
-        return False
+        # chances of every static code and state over the usual ship masses
+        self.chance_table = ChanceTable(self.bountydb.static_masses(), BountyConfig.CHANCE_HULLS)
 
-    def remove_signature(self, channel, signature):
-        for item in self.whlist:
-            [ch, sig, _] = item
+        # track a mass distribution along with the interval of every spawned wormhole
+        self.histogram = BountyConfig.MASS_MODEL == "histogram"
+        if self.histogram and not MassDistribution.available():
+            print "[Warning] NumPy is not installed, using the interval mass model"
+            self.histogram = False
 
-            if ch == channel and sig == signature:
-                self.whlist.remove(item)
-                return True
+    def present_signature(self, channel, signature):
+        return self.store.get(channel, signature) is not None
 
-        return False
+    def remove_signature(self, channel, signature):
+        return self.store.remove(channel, signature)
+
+    # remove the wormholes whose stable time is over (job)
+    def expire(self, now=None):
+        for [channel, signature, _] in self.store.expire(now):
+            self.expired += 1
+            if BountyConfig.MASS_TRACKER_NOTICE:
+                self.talk(
+                    channel,
+                    "Wormhole `{}` reached the end of its lifetime and is no longer tracked".format(signature),
+                    Outbox.PRIORITY_CHATTER
+                )
+
+    @staticmethod
+    def lifetime(wh, now=None):
+        """
+        :return: Human readable time left to a wormhole, None if unknown
+        """
+        if wh.expires is None:
+            return None
+
+        minutes = max(0, int(round((wh.expires - (time.time() if now is None else now)) / 60.0)))
+        return "{}h {:02d}m".format(minutes // 60, minutes % 60)
 
     def cbk_spawn(self, channel, cmd_args):
         """
@@ -55,9 +101,12 @@ class WhManager:
         """
         if len(cmd_args) == 0:
             message = ""
-            for [ch, sig, wh] in self.whlist:
-                if ch == channel:
-                    message += "Signature `{}`: {}\n".format(sig, str(wh))
+            with self.store.lock:
+                for [sig, wh] in self.store.channel_items(channel):
+                    message += "Signature `{}`: {}".format(sig, str(wh))
+                    if wh.expires is not None:
+                        message += ", Expires in: `{}`".format(WhManager.lifetime(wh))
+                    message += "\n"
 
             if message == "":
                 message = "No wormholes spawned in this channel"
@@ -67,25 +116,27 @@ class WhManager:
             signature = cmd_args[0].upper()
             wh_code = cmd_args[1]
             wh_state = cmd_args[2].lower()
+            eol = len(cmd_args) >= 4 and cmd_args[3].lower() == "eol"
 
             if not self.present_signature(channel, signature):
                 [maxmass, maxjump] = self.bountydb.static_mass(wh_code)
                 if maxmass > 0 and maxjump > 0:
-                    if wh_state == "new":
-                        wh_state_id = WormholeCrit.NEW
-                    elif wh_state == "stable":
-                        wh_state_id = WormholeCrit.STABLE
-                    elif wh_state == "unstable":
-                        wh_state_id = WormholeCrit.DESTAB
-                    elif wh_state == "critical":
-                        wh_state_id = WormholeCrit.CRIT
-                    else:
-                        wh_state_id = WormholeCrit.COLLAPSED
+                    wh_state_id = WhManager.STATES.get(wh_state, WormholeCrit.COLLAPSED)
 
                     if wh_state_id != WormholeCrit.COLLAPSED:
                         spawned_wormhole = WormholeCrit(maxmass, maxjump, wh_state_id)
-                        self.whlist.append([channel, signature, spawned_wormhole])
+                        if self.histogram:
+                            spawned_wormhole.model = MassDistribution(maxmass, wh_state_id)
+
+                        # end of the stable time, counted from now (the wormhole may be older)
+                        hours = WhManager.EOL_HOURS if eol else self.bountydb.static_lifetime(wh_code)
+                        if hours > 0:
+                            spawned_wormhole.expires = time.time() + hours * 3600
+
+                        self.store.add(channel, signature, spawned_wormhole)
                         message = "Signature `{}` added. {}".format(signature, str(spawned_wormhole))
+                        if spawned_wormhole.expires is not None:
+                            message += ", Expires in: `{}`".format(WhManager.lifetime(spawned_wormhole))
                     else:
                         message = self.cmd_error(
                             "spawn", "'{}' is not a valid state. Try: new, stable, unstable, critical".format(wh_state)
@@ -113,24 +164,22 @@ class WhManager:
             signature = cmd_args[0].upper()
 
             if represents_float(cmd_args[1]):
-                ship_mass = float(cmd_args[1])
-
-                message = ""
-                for [ch, sig, wh] in self.whlist:
-                    if ch == channel and sig == signature:
-                        [succesful_splash, _] = wh.splash(ship_mass)
-
-                        if succesful_splash:
-                            message = "Signature `{}` = {}".format(signature, str(wh))
-                            if wh.wh_state == WormholeCrit.COLLAPSED:
-                                status = self.remove_signature(channel, signature)
-                                if status:
-                                    message += "\nRemoving collapsed wormhole `{}`".format(signature)
+                # ship masses up to the first word which is not a number, the rest is ignored
+                ships = []
+                for mass in cmd_args[1:]:
+                    if not represents_float(mass):
+                        break
+                    ships.append(float(mass))
+
+                with self.store.lock:
+                    wh = self.store.get(channel, signature)
+                    if wh is not None:
+                        if len(ships) == 1:
+                            message = self.__splash_one(channel, signature, wh, ships[0])
                         else:
-                            message = "A ship mass of `{} kT` can not jump the wormhole".format(ship_mass)
-
-                if message == "":
-                    message = "No wormhole with signature `{}` was found".format(signature)
+                            message = self.__splash_pass(channel, signature, wh, ships)
+                    else:
+                        message = "No wormhole with signature `{}` was found".format(signature)
             else:
                 message = self.cmd_error("splash", "'{}' is not a valid ship mass".format(cmd_args[1]))
 
@@ -139,6 +188,69 @@ class WhManager:
 
         self.talk(channel, message)
 
+    def __splash_one(self, channel, signature, wh, ship_mass):
+        # single jump, the new state of the wormhole
+        [succesful_splash, _] = wh.splash(ship_mass)
+
+        if succesful_splash:
+            self.store.changed(channel, signature)
+            message = "Signature `{}` = {}".format(signature, str(wh))
+            if wh.wh_state == WormholeCrit.COLLAPSED:
+                status = self.remove_signature(channel, signature)
+                if status:
+                    message += "\nRemoving collapsed wormhole `{}`".format(signature)
+        else:
+            message = "A ship mass of `{} kT` can not jump the wormhole".format(ship_mass)
+
+        return message
+
+    def __splash_pass(self, channel, signature, wh, ships):
+        # sequence of jumps in one go, a summary of the state transitions
+        jumps = 0
+        jumped_mass = 0
+        transitions = []
+        refused = []
+        skipped = 0  # ships left after the collapse
+        for idx, ship_mass in enumerate(ships):
+            if wh.wh_state == WormholeCrit.COLLAPSED:
+                skipped = len(ships) - idx
+                break
+
+            state = wh.state_name()
+            [succesful_splash, wormhole_shrunk] = wh.splash(ship_mass)
+            if not succesful_splash:
+                refused.append(ship_mass)
+                continue
+
+            jumps += 1
+            jumped_mass += ship_mass
+            if wormhole_shrunk:
+                transitions.append(">Ship {} (`{} kT`): `{}` -> `{}`".format(
+                    idx + 1, ship_mass, state, wh.state_name()
+                ))
+
+        if jumps == 0:
+            return "None of the ships can jump the wormhole (Maxjump: `{} kT`)".format(wh.max_jump)
+
+        self.store.changed(channel, signature)
+        message = "Signature `{}`: `{}` jumps, `{} kT` in total".format(signature, jumps, jumped_mass)
+        if transitions:
+            message += "\n" + "\n".join(transitions)
+        message += "\nSignature `{}` = {}".format(signature, str(wh))
+
+        if refused:
+            message += "\nIgnored ships heavier than the maxjump: {}".format(
+                ", ".join(["`{} kT`".format(mass) for mass in sorted(set(refused))])
+            )
+        if wh.wh_state == WormholeCrit.COLLAPSED:
+            if skipped:
+                message += "\n`{}` ship(s) after the collapse were not counted".format(skipped)
+            status = self.remove_signature(channel, signature)
+            if status:
+                message += "\nRemoving collapsed wormhole `{}`".format(signature)
+
+        return message
+
     def cbk_shrink(self, channel, cmd_args):
         """
         !bb shrink
@@ -149,12 +261,13 @@ class WhManager:
         if len(cmd_args) >= 1:
             signature = cmd_args[0].upper()
 
-            message = ""
-            for [ch, sig, wh] in self.whlist:
-                if ch == channel and sig == signature:
+            with self.store.lock:
+                wh = self.store.get(channel, signature)
+                if wh is not None:
                     succesful_shrink = wh.shrink()
 
                     if succesful_shrink:
+                        self.store.changed(channel, signature)
                         message = "Signature `{}` = {}".format(signature, str(wh))
                         if wh.wh_state == WormholeCrit.COLLAPSED:
                             status = self.remove_signature(channel, signature)
@@ -162,9 +275,8 @@ class WhManager:
                                 message += "\nRemoving collapsed wormhole `{}`".format(signature)
                     else:
                         message = "Unable to shrink the wormhole (mass threshold not exceeded)"
-
-            if message == "":
-                message = "No wormhole with signature `{}` was found".format(signature)
+                else:
+                    message = "No wormhole with signature `{}` was found".format(signature)
         else:
             message = self.invalid_arg("shrink", 1)
 
@@ -203,18 +315,24 @@ class WhManager:
             if represents_float(cmd_args[1]):
                 ship_mass = float(cmd_args[1])
 
-                message = ""
-                for [ch, sig, wh] in self.whlist:
-                    if ch == channel and sig == signature:
+                with self.store.lock:
+                    wh = self.store.get(channel, signature)
+                    if wh is not None:
                         [plausible, chance] = wh.collapse_chance(ship_mass)
 
                         if plausible:
                             message = "Signature `{}`: chance of collapse is `{:.2f}%`".format(signature, chance)
+                            if wh.model is not None:
+                                message += "\nMass distribution: collapse `{:.2f}%`, shrink `{:.2f}%`, " \
+                                           "remaining mass between `{} kT` and `{} kT` (90% interval)".format(
+                                               wh.model.collapse_chance(ship_mass),
+                                               wh.model.shrink_chance(ship_mass),
+                                               *wh.model.interval()
+                                           )
                         else:
                             message = "A ship mass of `{} kT` can not jump the wormhole".format(ship_mass)
-
-                if message == "":
-                    message = "No wormhole with signature `{}` was found".format(signature)
+                    else:
+                        message = "No wormhole with signature `{}` was found".format(signature)
             else:
                 message = self.cmd_error("chance", "'{}' is not a valid ship mass".format(cmd_args[1]))
 
@@ -222,3 +340,96 @@ class WhManager:
             message = self.invalid_arg("chance", 2)
 
         self.talk(channel, message)
+
+    def cbk_plan(self, channel, cmd_args):
+        """
+        !bb plan
+        :param channel:
+        :param cmd_args:
+        :return:
+        """
+        if len(cmd_args) >= 2:
+            signature = cmd_args[0].upper()
+            invalid = [mass for mass in cmd_args[1:] if not represents_float(mass) or float(mass) <= 0]
+
+            if not invalid:
+                ships = [float(mass) for mass in cmd_args[1:]]
+
+                wh = self.store.get(channel, signature)
+                if wh is not None:
+                    too_heavy = [mass for mass in ships if mass > wh.max_jump]
+                    plan = RollPlan.solve(wh.mass, [mass for mass in ships if mass <= wh.max_jump])
+
+                    if plan is None:
+                        message = "None of the ships can jump the wormhole (Maxjump: `{} kT`)".format(wh.max_jump)
+                    elif plan.risk == 0:
+                        message = "Signature `{}`: collapse in `{}` jumps without stranding a ship\n{}".format(
+                            signature, plan.jumps, str(plan)
+                        )
+                    else:
+                        message = "Signature `{}`: no plan is free of risk, the best one strands a ship with " \
+                                  "a chance of `{:.2f}%` (`{}` jumps)\n{}".format(
+                                      signature, plan.risk * 100, plan.jumps, str(plan)
+                                  )
+
+                    if plan is not None and too_heavy:
+                        message += "\nIgnored ships heavier than the maxjump: {}".format(
+                            ", ".join(["`{} kT`".format(mass) for mass in sorted(set(too_heavy))])
+                        )
+                else:
+                    message = "No wormhole with signature `{}` was found".format(signature)
+            else:
+                message = self.cmd_error("plan", "'{}' is not a valid ship mass".format(invalid[0]))
+
+        else:
+            message = self.invalid_arg("plan", 2)
+
+        self.talk(channel, message)
+
+    def cbk_chance_table(self, channel, cmd_args):
+        """
+        !bb chance-table
+        :param channel:
+        :param cmd_args:
+        :return:
+        """
+        if len(cmd_args) >= 2:
+            wh_code = cmd_args[0].upper()
+            wh_state = cmd_args[1].lower()
+            invalid = [mass for mass in cmd_args[2:] if not represents_float(mass)]
+
+            static = self.chance_table.static(wh_code)
+            if static is None:
+                message = self.cmd_error("chance-table", "'{}' is not a wormhole code".format(wh_code))
+            elif wh_state not in WhManager.STATES:
+                message = self.cmd_error(
+                    "chance-table", "'{}' is not a valid state. Try: new, stable, unstable, critical".format(wh_state)
+                )
+            elif invalid:
+                message = self.cmd_error("chance-table", "'{}' is not a valid ship mass".format(invalid[0]))
+            else:
+                wh_state_id = WhManager.STATES[wh_state]
+                envelope = self.chance_table.envelope(wh_code, wh_state_id)
+                message = "Static `{}` (Mass: `{} kT`, Maxjump: `{} kT`) reported `{}`: " \
+                          "mass between `{} kT` and `{} kT`".format(
+                              wh_code, static[0], static[1], wh_state, envelope[0], envelope[1]
+                          )
+
+                if len(cmd_args) > 2:
+                    for ship_mass in [float(mass) for mass in cmd_args[2:]]:
+                        [plausible, collapse, shrink] = self.chance_table.chance(wh_code, wh_state_id, ship_mass)
+                        if plausible:
+                            message += "\n>`{} kT`: collapse `{:.2f}%`, shrink `{:.2f}%`".format(
+                                ship_mass, collapse, shrink
+                            )
+                        else:
+                            message += "\n>`{} kT`: can not jump the wormhole".format(ship_mass)
+                else:
+                    lines = ["{:>10} {:>9} {:>9}".format("Ship [kT]", "Collapse", "Shrink")]
+                    for [hull, collapse, shrink] in self.chance_table.rows(wh_code, wh_state_id):
+                        lines.append("{:>10} {:>8.2f}% {:>8.2f}%".format(hull, collapse, shrink))
+                    message += "\n```\n{}\n```".format("\n".join(lines))
+        else:
+            message = self.invalid_arg("chance-table", 2)
+
+        self.talk(channel, message)
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from bb_wheel import TimingWheel
+from wormholecrit import WormholeCrit
+
+
+class WhStore:
+    """
+    Spawned wormholes indexed by (channel, signature), persisted in the background after every change
+    and removed once their lifetime is over
+    """
+
+    WHEEL_SLOTS = 1440  # expiry wheel slots (one day with a tick of a minute)
+
+    def __init__(self, rows, persist, interval, tick):
+        """
+        :param rows: Saved wormholes as [channel, signature, state], state being a JSON string of WormholeCrit.to_dict()
+        :param persist: Function (updates, removals) saving [channel, signature, state]
+                        and removing [channel, signature]
+        :param interval: Seconds between two background writes
+        :param tick: Expiry resolution [seconds]
+        """
+        self.persist = persist
+        self.interval = interval
+
+        self.__channels = {}  # channel -> OrderedDict of signature -> WormholeCrit, in spawn order
+        self.__dirty = set()  # (channel, signature) changed since the last write
+        self.__expiry = TimingWheel(tick, WhStore.WHEEL_SLOTS)  # (channel, signature) by WormholeCrit.expires
+        self.lock = threading.RLock()  # held while reading or modifying a wormhole and while snapshotting it
+
+        for [channel, signature, state] in rows:
+            try:
+                wh = WormholeCrit.from_dict(json.loads(state))
+            except (ValueError, KeyError, TypeError):
+                print "[Error] Invalid mass tracker state of {} in {}".format(signature, channel)
+            else:
+                self.__channels.setdefault(channel, OrderedDict())[signature] = wh
+                if wh.expires is not None:
+                    self.__expiry.schedule((channel, signature), wh.expires)
+
+        writer = threading.Thread(target=self.__write_behind, name="bb-whstore")
+        writer.daemon = True
+        writer.start()
+
+    def get(self, channel, signature):
+        """
+        :return: WormholeCrit or None if the signature is not spawned in the channel
+        """
+        with self.lock:
+            return self.__channels.get(channel, {}).get(signature)
+
+    def __len__(self):
+        with self.lock:
+            return sum([len(wormholes) for wormholes in self.__channels.values()])
+
+    def add(self, channel, signature, wh):
+        with self.lock:
+            self.__channels.setdefault(channel, OrderedDict())[signature] = wh
+            self.__dirty.add((channel, signature))
+            if wh.expires is not None:
+                self.__expiry.schedule((channel, signature), wh.expires)
+            else:
+                self.__expiry.cancel((channel, signature))
+
+    def changed(self, channel, signature):
+        """
+        Schedule the write of a wormhole modified in place (splash, shrink), the change being made under lock
+        so that the background write never serializes it half applied
+        """
+        with self.lock:
+            self.__dirty.add((channel, signature))
+
+    def remove(self, channel, signature):
+        """
+        :return: True if the signature was spawned in the channel
+        """
+        with self.lock:
+            wormholes = self.__channels.get(channel)
+            if wormholes is None or signature not in wormholes:
+                return False
+
+            del wormholes[signature]
+            if not wormholes:
+                del self.__channels[channel]
+            self.__dirty.add((channel, signature))
+            self.__expiry.cancel((channel, signature))
+            return True
+
+    def expire(self, now=None):
+        """
+        Remove the wormholes whose lifetime is over
+        :param now: Current unix timestamp (defaults to time.time())
+        :return: List of removed [channel, signature, WormholeCrit]
+        """
+        removed = []
+        with self.lock:
+            for [(channel, signature), _] in self.__expiry.advance(now):
+                wormholes = self.__channels.get(channel)
+                wh = wormholes.pop(signature, None) if wormholes is not None else None
+                if wh is None:
+                    continue
+
+                if not wormholes:
+                    del self.__channels[channel]
+                self.__dirty.add((channel, signature))
+                removed.append([channel, signature, wh])
+        return removed
+
+    def channel_items(self, channel):
+        """
+        :return: List of [signature, WormholeCrit] spawned in the channel, in spawn order
+        """
+        with self.lock:
+            return [[signature, wh] for signature, wh in self.__channels.get(channel, {}).items()]
+
+    def flush(self):
+        """
+        Write every change made since the previous flush
+        :return: Number of written changes
+        """
+        with self.lock:
+            dirty = self.__dirty
+            updates = []
+            removals = []
+            for (channel, signature) in dirty:
+                wh = self.__channels.get(channel, {}).get(signature)
+                if wh is not None:
+                    updates.append([channel, signature, json.dumps(wh.to_dict())])
+                else:
+                    removals.append([channel, signature])
+            self.__dirty = set()
+
+        if updates or removals:
+            try:
+                self.persist(updates, removals)
+            except Exception:
+                # keep the changes for the next attempt
+                with self.lock:
+                    self.__dirty.update(dirty)
+                raise
+        return len(updates) + len(removals)
+
+    def __write_behind(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
@@ -4,6 +4,8 @@ Created on 2016-01-22
 @author: Valtyr Farshield
 """
 
+from massmodel import MassDistribution
+
 
 class WormholeCrit:
     """
@@ -28,10 +30,20 @@ class WormholeCrit:
         self._md = (0, 0)
         self._mc = (0, 0)
         self._last_mass = 0
+        self.model = None  # optional MassDistribution, updated along with the interval
+        self.expires = None  # unix timestamp of the end of the wormhole's lifetime, if known
 
         self.change_type(wh_mass, wh_max_jump, wh_state)
 
     def __str__(self):
+        return "Mass is between `{} kT` and `{} kT`, Maxjump: `{} kT`, Status: `{}`".format(
+            self.mass[0],
+            self.mass[1],
+            self.max_jump,
+            self.state_name()
+        )
+
+    def state_name(self):
         if self.wh_state == WormholeCrit.NEW:
             state = "new"
         elif self.wh_state == WormholeCrit.STABLE:
@@ -45,12 +57,39 @@ class WormholeCrit:
         else:
             state = "unknown"
 
-        return "Mass is between `{} kT` and `{} kT`, Maxjump: `{} kT`, Status: `{}`".format(
-            self.mass[0],
-            self.mass[1],
-            self.max_jump,
-            state
-        )
+        return state
+
+    def to_dict(self):
+        """
+        State of the calculator, for persistence
+        :return: Dictionary of plain values (JSON serializable)
+        """
+        return {
+            "n_mass": self.n_mass,
+            "max_jump": self.max_jump,
+            "mass": list(self.mass),
+            "kstate": self.kstate,
+            "wh_state": self.wh_state,
+            "last_mass": self._last_mass,
+            "model": self.model.to_dict() if self.model is not None else None,
+            "expires": self.expires
+        }
+
+    @staticmethod
+    def from_dict(state):
+        """
+        Rebuild a calculator saved with to_dict()
+        :param state: Dictionary returned by to_dict()
+        :return: WormholeCrit
+        """
+        wh = WormholeCrit(state["n_mass"], state["max_jump"], state["wh_state"])
+        wh.mass = tuple(state["mass"])
+        wh.kstate = state["kstate"]
+        wh._last_mass = state["last_mass"]
+        wh.expires = state.get("expires")
+        if state.get("model") and MassDistribution.available():
+            wh.model = MassDistribution.from_dict(state["model"])
+        return wh
 
     def change_type(self, wh_mass, wh_max_jump, wh_state):
         self.n_mass = wh_mass
@@ -82,6 +121,9 @@ class WormholeCrit:
         succesful_splash = 0 < ship_mass <= self.max_jump and self.wh_state != WormholeCrit.COLLAPSED
 
         if succesful_splash:
+            if self.model is not None:
+                self.model.splash(ship_mass)
+
             self._last_mass = self.mass[0] - ship_mass
             if self._last_mass < 0:
                 self._last_mass = 0
@@ -168,11 +210,17 @@ class WormholeCrit:
         else:
             pass
 
+        if succesful_shrink and self.model is not None:
+            self.model.observe_state(self.wh_state)
+
         return succesful_shrink
 
     def collapse_chance(self, ship_mass):
         plausible = 0 < ship_mass <= self.max_jump and self.wh_state != WormholeCrit.COLLAPSED
-        if plausible:
+        if plausible and self.mass[1] <= self.mass[0]:
+            # remaining mass known exactly
+            chance = 100 if ship_mass >= self.mass[0] else 0
+        elif plausible:
             chance = float(ship_mass - self.mass[0]) / (self.mass[1] - self.mass[0]) * 100.0
 
             if chance < 0:
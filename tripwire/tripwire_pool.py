@@ -0,0 +1,152 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import MySQLdb
+
+from bb_metrics import metrics
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class TripwirePool:
+    """
+    Bounded pool of Tripwire MySQL connections, checked with a ping when they were idle for a while
+    and replaced when they turn out to be broken
+    """
+
+    def __init__(self, connect, size, wait_timeout, ping_after):
+        """
+        :param connect: Function opening a new MySQLdb connection
+        :param size: Maximum number of open connections
+        :param wait_timeout: Seconds to wait for a free connection before giving up (PoolTimeout)
+        :param ping_after: Idle seconds after which a connection is pinged before being handed out
+        """
+        self.connect = connect
+        self.size = size
+        self.wait_timeout = wait_timeout
+        self.ping_after = ping_after
+
+        self.__idle = []            # [connection, last use timestamp], most recently used last
+        self.__open = 0             # connections open, idle or in use
+        self.__available = threading.Condition(threading.Lock())
+
+        self.__wait = metrics.histogram(
+            "bb_tripwire_pool_wait_seconds", "Time waited for a Tripwire connection [seconds]",
+            bounds=[0.001, 0.01, 0.1, 0.5, 1, 5, 10, 30, 60]
+        )
+        self.__connects = metrics.counter("bb_tripwire_connects_total", "Tripwire connections opened")
+        self.__reconnects = metrics.counter("bb_tripwire_reconnects_total", "Broken Tripwire connections replaced")
+        self.__timeouts = metrics.counter("bb_tripwire_pool_timeouts_total", "Tripwire connection waits given up")
+        metrics.gauge("bb_tripwire_pool_open", "Open Tripwire connections", function=lambda: self.__open)
+        metrics.gauge("bb_tripwire_pool_idle", "Idle Tripwire connections", function=lambda: len(self.__idle))
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection: committed and returned to the pool if the block succeeds,
+        rolled back otherwise (and closed if MySQL reported an error)
+        """
+        db_con = self.acquire()
+        try:
+            yield db_con
+            db_con.commit()
+        except MySQLdb.Error:
+            self.release(db_con, broken=True)
+            raise
+        except Exception:
+            try:
+                db_con.rollback()
+            except MySQLdb.Error:
+                self.release(db_con, broken=True)
+                raise
+            self.release(db_con)
+            raise
+        else:
+            self.release(db_con)
+
+    def acquire(self):
+        """
+        :return: Healthy connection, to be given back with release()
+        """
+        start = time.time()
+        deadline = start + self.wait_timeout
+        with self.__available:
+            while not self.__idle and self.__open >= self.size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.__timeouts.inc()
+                    raise PoolTimeout("No Tripwire connection available after {}s".format(self.wait_timeout))
+                self.__available.wait(remaining)
+
+            if self.__idle:
+                [db_con, last_use] = self.__idle.pop()
+            else:
+                [db_con, last_use] = [None, None]
+            self.__open += 1 if db_con is None else 0
+        self.__wait.observe(time.time() - start)
+
+        try:
+            if db_con is None:
+                db_con = self.connect()
+                self.__connects.inc()
+            elif time.time() - last_use >= self.ping_after and not self.__alive(db_con):
+                db_con = self.connect()
+                self.__reconnects.inc()
+        except Exception:
+            self.__discard()
+            raise
+        return db_con
+
+    def release(self, db_con, broken=False):
+        """
+        Give a connection back to the pool
+        :param db_con: Connection returned by acquire()
+        :param broken: Close the connection instead of keeping it
+        """
+        if broken:
+            try:
+                db_con.close()
+            except MySQLdb.Error:
+                pass
+            self.__discard()
+        else:
+            with self.__available:
+                self.__idle.append([db_con, time.time()])
+                self.__available.notify()
+
+    def close(self):
+        """
+        Close the idle connections
+        """
+        with self.__available:
+            idle = self.__idle
+            self.__idle = []
+            self.__open -= len(idle)
+            self.__available.notify_all()
+
+        for [db_con, _] in idle:
+            try:
+                db_con.close()
+            except MySQLdb.Error:
+                pass
+
+    def __discard(self):
+        # a connection slot is free again
+        with self.__available:
+            self.__open -= 1
+            self.__available.notify()
+
+    @staticmethod
+    def __alive(db_con):
+        try:
+            db_con.ping()
+            return True
+        except MySQLdb.Error:
+            try:
+                db_con.close()
+            except MySQLdb.Error:
+                pass
+            return False
@@ -17,11 +17,20 @@ class TripwireSql:
     generic_message = "This is a potential generic bounty system. Please verify if the requirements are met."
     message_suffix = '<span style="font-size:9px;"><em><span style="color:#D3D3D3;">' \
                      'Please do not remove or modify this comment.</span></em></span>'
+    generic_pattern = re.compile('\[<span style="color:#00FF00;">#([0-9]+):</span> (.*?)\]')
+    chunk_size = 500  # systems per SELECT of the bulk generic operations
 
-    def __init__(self, user, passwd, mask, trip_char_id, host='127.0.0.1', port=3306, db='tripwire'):
+    def __init__(self, user, passwd, mask, trip_char_id, host='127.0.0.1', port=3306, db='tripwire', db_con=None):
         self.mask = mask
         self.trip_char_id = trip_char_id
-        self.db_con = MySQLdb.connect(
+        if db_con is None:
+            db_con = TripwireSql.connect(user, passwd, host, port, db)
+        self.db_con = db_con  # own connection, or one borrowed from a TripwirePool (committed by the pool)
+        self.cursor = self.db_con.cursor()
+
+    @staticmethod
+    def connect(user, passwd, host='127.0.0.1', port=3306, db='tripwire'):
+        return MySQLdb.connect(
             host=host,
             port=port,
             user=user,
@@ -29,7 +38,6 @@ class TripwireSql:
             db=db,
             charset='utf8'
         )
-        self.cursor = self.db_con.cursor()
 
     @staticmethod
     def _time_now():
@@ -104,57 +112,114 @@ class TripwireSql:
         comment += '<br />' + self.message_suffix
         return comment
 
-    def add_generic(self, generic_id, description, system_ids):
+    def _get_generic_comments(self, system_ids):
+        """
+        Generic order comments of many systems, one query per chunk of systems
+        :param system_ids: Wormhole system IDs
+        :return: Dictionary system ID -> [comment ID, dictionary generic ID -> description]
+        """
+        generic_comments = {}
+        for idx in range(0, len(system_ids), self.chunk_size):
+            chunk = system_ids[idx:idx + self.chunk_size]
+            query = "SELECT id, systemID, comment FROM comments " \
+                    "WHERE systemID IN ({}) AND createdBy=%s AND maskID=%s ORDER BY id".format(
+                        ", ".join(["%s"] * len(chunk))
+                    )
+            self.cursor.execute(query, tuple(chunk) + (self.trip_char_id, self.mask))
+            for comment_id, system_id, comment_text in self.cursor.fetchall():
+                if system_id not in generic_comments and self.generic_message in comment_text:
+                    generic_comments[system_id] = [comment_id, dict(self.generic_pattern.findall(comment_text))]
+        return generic_comments
+
+    def _add_comments(self, comments):
+        # comments: list of [system ID, comment text]
+        if not comments:
+            return
+        query = """\
+            INSERT INTO comments (systemID, comment, created, createdBy, modifiedBy, maskID)
+            VALUES (%s, %s, %s, %s, %s, %s)\
+            """
+        now = self._time_now()
+        self.cursor.executemany(query, [
+            (system_id, comment_text, now, self.trip_char_id, self.trip_char_id, self.mask)
+            for [system_id, comment_text] in comments
+        ])
+
+    def _edit_comments(self, comments):
+        # comments: list of [comment ID, comment text]
+        if not comments:
+            return
+        query = "UPDATE comments SET comment=%s, modified=%s, modifiedBy=%s WHERE id=%s"
+        now = self._time_now()
+        self.cursor.executemany(query, [
+            (comment_text, now, self.trip_char_id, comment_id) for [comment_id, comment_text] in comments
+        ])
+
+    def _delete_comments(self, comment_ids):
+        if not comment_ids:
+            return
+        query = "DELETE FROM comments WHERE id=%s"
+        self.cursor.executemany(query, [(comment_id, ) for comment_id in comment_ids])
+
+    @staticmethod
+    def _unique(system_ids):
+        # system IDs without duplicates, in order
+        unique_ids = []
+        seen = set()
         for sys_id in system_ids:
-            comment_id_found = None
-            generic_orders = {
-                str(generic_id): description,
-            }
+            if sys_id not in seen:
+                seen.add(sys_id)
+                unique_ids.append(sys_id)
+        return unique_ids
 
-            result = self._get_comments(sys_id)
-            for comment_id, comment_text in result:
-                if self.generic_message in comment_text:
-                    comment_id_found = comment_id
-                    for idx, desc in re.findall(
-                            '\[<span style="color:#00FF00;">#([0-9]+):</span> (.*?)\]',
-                            comment_text
-                    ):
-                        generic_orders[idx] = desc
-                    break
-
-            # add/update comment
-            comment = self._construct_generic_comment(generic_orders)
-            if comment_id_found:
-                self._edit_comment(comment_id_found, comment)
-            else:
-                self._add_comment(sys_id, comment)
+    def add_generic(self, generic_id, description, system_ids):
+        """
+        Add (or update) a generic order in the generic comment of many systems;
+        comments already holding the same description are not written
+        :param generic_id: Generic order ID
+        :param description: Generic order description
+        :param system_ids: Wormhole system IDs
+        :return: None
+        """
+        system_ids = self._unique(system_ids)
+        generic_comments = self._get_generic_comments(system_ids)
 
-    def delete_generic(self, generic_id, system_ids):
+        additions = []
+        edits = []
         for sys_id in system_ids:
-            comment_id_found = None
-            generic_orders = {}
+            if sys_id in generic_comments:
+                [comment_id, generic_orders] = generic_comments[sys_id]
+                if generic_orders.get(str(generic_id)) == description:
+                    continue
+                generic_orders[str(generic_id)] = description
+                edits.append([comment_id, self._construct_generic_comment(generic_orders)])
+            else:
+                additions.append([sys_id, self._construct_generic_comment({str(generic_id): description})])
 
-            result = self._get_comments(sys_id)
-            for comment_id, comment_text in result:
-                if self.generic_message in comment_text:
-                    comment_id_found = comment_id
-                    for idx, desc in re.findall(
-                            '\[<span style="color:#00FF00;">#([0-9]+):</span> (.*?)\]',
-                            comment_text
-                    ):
-                        generic_orders[idx] = desc
-                    break
-
-            # remove/update comment
-            if comment_id_found:
-                if len(generic_orders) > 1:
-                    if str(generic_id) in generic_orders.keys():
-                        del generic_orders[str(generic_id)]
-                    comment = self._construct_generic_comment(generic_orders)
-                    self._edit_comment(comment_id_found, comment)
+        self._add_comments(additions)
+        self._edit_comments(edits)
+
+    def delete_generic(self, generic_id, system_ids):
+        """
+        Remove a generic order from the generic comment of many systems (the comment goes with its last order)
+        :param generic_id: Generic order ID
+        :param system_ids: Wormhole system IDs
+        :return: None
+        """
+        generic_comments = self._get_generic_comments(self._unique(system_ids))
+
+        edits = []
+        deletions = []
+        for [comment_id, generic_orders] in generic_comments.values():
+            if str(generic_id) in generic_orders:
+                del generic_orders[str(generic_id)]
+                if generic_orders:
+                    edits.append([comment_id, self._construct_generic_comment(generic_orders)])
                 else:
-                    if str(generic_id) in generic_orders.keys():
-                        self._delete_comment(comment_id_found)
+                    deletions.append(comment_id)
+
+        self._edit_comments(edits)
+        self._delete_comments(deletions)
 
     def close_db(self):
         self.db_con.commit()